@@ -2,6 +2,8 @@ import os
 from openai import OpenAI
 from typing import Optional
 
+from metrics import record_api_error, record_llm_usage, status_of
+
 # OpenAI APIクライアントは必要になったタイミングで初期化する
 # （YouTube処理を使わない通常URL登録でもBot起動できるようにする）
 client = None
@@ -141,6 +143,7 @@ def generate_article_with_gpt5(
         # 使用情報の出力
         if hasattr(response, 'usage'):
             usage = response.usage
+            record_llm_usage(model, usage)
             print(f"トークン使用量 - 入力: {usage.prompt_tokens}, 出力: {usage.completion_tokens}, 合計: {usage.total_tokens}")
             
             # GPT-5の推論トークンも表示（利用可能な場合）
@@ -151,6 +154,7 @@ def generate_article_with_gpt5(
         return article
         
     except Exception as e:
+        record_api_error("openai", status_of(e))
         print(f"記事生成中にエラーが発生しました: {e}")
         return None
 
@@ -0,0 +1,90 @@
+import os
+import asyncio
+import threading
+import weakref
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict
+
+# バックエンドごとの同時実行数の上限（デフォルト値）
+# 環境変数 <NAME>_CONCURRENCY で上書き可能（例: FIRECRAWL_CONCURRENCY=4）
+_DEFAULT_LIMITS = {
+    "firecrawl": 2,
+    "fxtwitter": 4,
+    "playwright": 1,  # Chromiumはメモリを大きく消費するため1つずつ
+    "notion": 3,      # Notion APIは平均3リクエスト/秒の制限あり
+    "gemini": 4,
+}
+
+# 上限を変更できないバックエンド（環境変数で大きな値を指定しても、この値に切り詰める）
+# playwright: browser_pool はブラウザ・ページを1つだけ持ち1件ずつ処理するため、枠を増やしても待機が増えるだけ
+_MAX_LIMITS = {
+    "playwright": 1,
+}
+
+
+def _read_limit(name: str, default: int) -> int:
+    """環境変数から同時実行数の上限を読み込む（不正値の場合はデフォルト値）"""
+    env_name = f"{name.upper()}_CONCURRENCY"
+    raw = os.environ.get(env_name)
+    if raw is None:
+        return default
+    try:
+        limit = max(1, int(raw))
+    except ValueError:
+        print(f"警告: {env_name} の値が不正です（{raw}）。デフォルト値 {default} を使用します。")
+        return default
+    max_limit = _MAX_LIMITS.get(name)
+    if max_limit is not None and limit > max_limit:
+        print(f"警告: {env_name} は {max_limit} より大きくできません（{raw}）。{max_limit} を使用します。")
+        return max_limit
+    return limit
+
+
+BACKEND_LIMITS: Dict[str, int] = {
+    name: _read_limit(name, default) for name, default in _DEFAULT_LIMITS.items()
+}
+
+_semaphores: Dict[str, threading.BoundedSemaphore] = {
+    name: threading.BoundedSemaphore(limit) for name, limit in BACKEND_LIMITS.items()
+}
+
+# asyncio用のセマフォはイベントループごとに作成する
+# （同期ラッパーの asyncio.run で別ループから呼ばれても衝突しないように）
+_async_semaphores = weakref.WeakKeyDictionary()
+
+
+@contextmanager
+def backend_slot(name: str):
+    """
+    指定したバックエンドの同時実行枠を1つ確保する
+
+    上限に達している場合は、他のワーカーが枠を解放するまで待機する。
+
+    引数:
+        name: バックエンド名（firecrawl / fxtwitter / playwright / notion / gemini）
+    """
+    semaphore = _semaphores[name]
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+@asynccontextmanager
+async def async_backend_slot(name: str):
+    """
+    指定したバックエンドの同時実行枠を1つ確保する（asyncio版）
+
+    上限はスレッド版と同じ BACKEND_LIMITS を使用する。
+
+    引数:
+        name: バックエンド名（firecrawl / fxtwitter / playwright / notion / gemini）
+    """
+    loop = asyncio.get_running_loop()
+    semaphores = _async_semaphores.setdefault(loop, {})
+    semaphore = semaphores.get(name)
+    if semaphore is None:
+        semaphore = semaphores[name] = asyncio.Semaphore(BACKEND_LIMITS[name])
+    async with semaphore:
+        yield
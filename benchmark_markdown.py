@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from typing import Dict, Iterator, List, Tuple
+
+from markdown_to_notion import (
+    MAX_BLOCKS_PER_REQUEST, MAX_REQUEST_BYTES, compact_paragraphs, iter_markdown_blocks, iter_block_batches,
+)
+
+# Markdown → Notionブロック変換のベンチマーク（ネットワークを使わずにオフラインで実行できる）
+#
+# 使い方:
+#   python benchmark_markdown.py                    # 計測して基準値と比較し、data/benchmark_results.json を更新
+#   python benchmark_markdown.py --no-save          # 計測結果の表示と基準値との比較のみ
+#   python benchmark_markdown.py --update-baseline  # 変換結果の変更が意図したものなら基準値を更新
+#
+# ブロック数・リクエスト数などの実行環境に依存しない値は benchmarks/baseline.json（リポジトリで管理）を
+# 基準値として比較し、変わっていれば差分を表示して終了コード1を返す（基準値の更新は git diff で確認できる）。
+# 変換速度・メモリは実行環境ごとに異なるため DATA_DIR に保存し、前回の実行との変化だけを表示する。
+
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+DEFAULT_OUTPUT = os.path.join(DATA_DIR, "benchmark_results.json")
+BASELINE_FILE = os.path.join("benchmarks", "baseline.json")
+
+# 基準値として比較する（実行環境に依存しない）項目
+BASELINE_FIELDS = (
+    "size_bytes",
+    "blocks",
+    "projected_requests",
+    "compacted_blocks",
+    "compacted_requests",
+    "avg_batch_block_fill",
+    "avg_batch_byte_fill",
+)
+
+# 既存のサンプル記事
+CORPUS_FILES = [
+    "downloaded/output.md",
+    "article_test.md",
+    "article_gpt5_test.md",
+    "youtube_test.md",
+]
+
+# 合成ドキュメント（名前, 種類, サイズ）。乱数のシードを固定しているので毎回同じ内容になる
+SYNTHETIC_DOCUMENTS = [
+    ("synthetic-mixed-1mb", "mixed", 1 * 1024 * 1024),
+    ("synthetic-mixed-4mb", "mixed", 4 * 1024 * 1024),
+    ("synthetic-long-paragraphs-2mb", "long_paragraphs", 2 * 1024 * 1024),
+    ("synthetic-code-2mb", "code", 2 * 1024 * 1024),
+]
+
+# ページ作成時に先頭に付く導入文と区切り線（notion_table._intro_blocks）とプロパティの分
+INTRO_BLOCKS = 2
+RESERVED_BYTES = 2_000
+
+_WORDS = (
+    "Steam Notion API release update player market revenue game design latency cache "
+    "ゲーム 開発 売上 分析 記事 データ 市場 ユーザー 機能 公開 性能 改善"
+).split()
+
+
+def _sentence(rnd: random.Random, words: int) -> str:
+    text = " ".join(rnd.choice(_WORDS) for _ in range(words))
+    if rnd.random() < 0.3:
+        text += f" [{rnd.choice(_WORDS)}](https://example.com/{rnd.randrange(10 ** 6)})"
+    return text + "."
+
+
+def _mixed_section(rnd: random.Random) -> List[str]:
+    """Firecrawlで取得した記事に近い構成（見出し・段落・リスト・引用・画像・コード）"""
+    lines = [f"{'#' * rnd.randint(1, 3)} {_sentence(rnd, rnd.randint(3, 8))}", ""]
+    for _ in range(rnd.randint(1, 4)):
+        lines.append(" ".join(_sentence(rnd, rnd.randint(8, 30)) for _ in range(rnd.randint(1, 5))))
+        lines.append("")
+    kind = rnd.random()
+    if kind < 0.3:
+        lines.extend(f"- {_sentence(rnd, rnd.randint(3, 12))}" for _ in range(rnd.randint(2, 8)))
+    elif kind < 0.45:
+        lines.extend(f"{i + 1}. {_sentence(rnd, rnd.randint(3, 12))}" for i in range(rnd.randint(2, 6)))
+    elif kind < 0.55:
+        lines.extend(f"- [{rnd.choice(' x')}] {_sentence(rnd, rnd.randint(3, 8))}" for _ in range(rnd.randint(2, 5)))
+    elif kind < 0.7:
+        lines.append(f"> {_sentence(rnd, rnd.randint(10, 40))}")
+    elif kind < 0.85:
+        lines.append(f"![{_sentence(rnd, 3)}](https://example.com/images/{rnd.randrange(10 ** 6)}.png)")
+    else:
+        lines.append(f"```{rnd.choice(['python', 'js', 'bash', 'unknown'])}")
+        lines.extend(f"    value_{i} = compute({i})" for i in range(rnd.randint(3, 20)))
+        lines.append("```")
+    lines.append("")
+    return lines
+
+
+def _long_paragraph_section(rnd: random.Random) -> List[str]:
+    """2000文字を超える段落（rich_text・ブロックの分割処理が多く発生する）"""
+    return [" ".join(_sentence(rnd, 20) for _ in range(rnd.randint(20, 80))), ""]
+
+
+def _code_section(rnd: random.Random) -> List[str]:
+    """長いコードブロック"""
+    lines = [f"```{rnd.choice(['python', 'ts', 'sh', 'rust'])}"]
+    lines.extend(f"def handler_{i}(x):\n    return x * {i}  # {_sentence(rnd, 4)}" for i in range(rnd.randint(50, 300)))
+    lines.append("```")
+    lines.append("")
+    return lines
+
+
+_SECTION_BUILDERS = {
+    "mixed": _mixed_section,
+    "long_paragraphs": _long_paragraph_section,
+    "code": _code_section,
+}
+
+
+def generate_synthetic_markdown(kind: str, size: int, seed: int = 0) -> str:
+    """指定した種類・おおよそのサイズ（バイト）の合成Markdownを生成する"""
+    rnd = random.Random(seed)
+    build = _SECTION_BUILDERS[kind]
+    parts: List[str] = []
+    total = 0
+    while total < size:
+        section = "\n".join(build(rnd)) + "\n"
+        parts.append(section)
+        total += len(section.encode("utf-8"))
+    return "".join(parts)
+
+
+def load_corpus() -> Iterator[Tuple[str, str]]:
+    """(名前, Markdown) を順に返す（存在しないサンプルファイルはスキップ）"""
+    for path in CORPUS_FILES:
+        if not os.path.exists(path):
+            print(f"警告: {path} が見つからないためスキップします")
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            yield path, f.read()
+    for name, kind, size in SYNTHETIC_DOCUMENTS:
+        yield name, generate_synthetic_markdown(kind, size)
+
+
+def _convert_in_batches(content: str, compact: bool = False) -> Dict:
+    """
+    アップロード時と同じくバッチ単位で変換を進める（ブロックは保持しない）
+
+    compact=True の場合は短い段落をまとめてからバッチに分ける（NOTION_COMPACT_PARAGRAPHS=1 の場合と同じ）
+
+    戻り値:
+        dict: ブロック数、Notion APIのリクエスト数（ページ作成 + 残りの追加）、バッチの平均充填率
+    """
+    blocks = requests = 0
+    block_fill = byte_fill = 0.0
+    blocks_iter = iter_markdown_blocks(content)
+    if compact:
+        blocks_iter = compact_paragraphs(blocks_iter)
+    batches = iter_block_batches(blocks_iter, reserved_blocks=INTRO_BLOCKS, reserved_bytes=RESERVED_BYTES)
+    for batch in batches:
+        blocks += len(batch.blocks)
+        requests += 1
+        block_fill += batch.block_fill
+        byte_fill += batch.byte_fill
+    return {
+        "blocks": blocks,
+        "requests": max(1, requests),  # ブロックがなくてもページ作成の1回は必要
+        "block_fill": block_fill / requests if requests else 0.0,
+        "byte_fill": byte_fill / requests if requests else 0.0,
+    }
+
+
+def benchmark_document(name: str, content: str, repeat: int) -> Dict:
+    """1つのドキュメントの変換速度・ピークメモリ・ブロック数を計測する"""
+    timings = []
+    stats = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stats = _convert_in_batches(content)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    block_count = stats["blocks"]
+
+    # ピークメモリは計測のオーバーヘッドがあるため速度とは別に1回だけ測る
+    # （入力文字列自体は計測開始前に確保済みなので含まない）
+    tracemalloc.start()
+    try:
+        _convert_in_batches(content)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # 段落をまとめた場合のブロック数・リクエスト数（速度は計測しない）
+    compacted = _convert_in_batches(content, compact=True)
+
+    size = len(content.encode("utf-8"))
+    return {
+        "name": name,
+        "size_bytes": size,
+        "blocks": block_count,
+        "projected_requests": stats["requests"],
+        "compacted_blocks": compacted["blocks"],
+        "compacted_requests": compacted["requests"],
+        "avg_batch_block_fill": round(stats["block_fill"], 3),
+        "avg_batch_byte_fill": round(stats["byte_fill"], 3),
+        "seconds": round(best, 4),
+        "blocks_per_second": round(block_count / best) if best > 0 else None,
+        "mb_per_second": round(size / (1024 * 1024) / best, 2) if best > 0 else None,
+        "peak_memory_kb": round(peak / 1024),
+    }
+
+
+def _print_comparison(results: List[Dict], previous: Dict[str, Dict]) -> None:
+    print(
+        f"{'document':<32} {'bytes':>10} {'blocks':>8} {'requests':>10} {'compacted':>15} "
+        f"{'blocks/s':>10} {'peak KB':>9} {'change':>8}"
+    )
+    for r in results:
+        before = previous.get(r["name"])
+        change = ""
+        if before and before.get("blocks_per_second") and r["blocks_per_second"]:
+            change = f"{(r['blocks_per_second'] / before['blocks_per_second'] - 1) * 100:+.1f}%"
+            if before.get("blocks") != r["blocks"]:
+                change += " (ブロック数変化)"
+        compacted = f"{r['compacted_blocks']}/{r['compacted_requests']}"
+        print(
+            f"{r['name']:<32} {r['size_bytes']:>10} {r['blocks']:>8} {r['projected_requests']:>10} {compacted:>15} "
+            f"{r['blocks_per_second'] or '-':>10} {r['peak_memory_kb']:>9} {change:>8}"
+        )
+
+
+def _baseline_report(results: List[Dict]) -> Dict:
+    return {
+        "max_blocks_per_request": MAX_BLOCKS_PER_REQUEST,
+        "max_request_bytes": MAX_REQUEST_BYTES,
+        "results": [dict({"name": r["name"]}, **{key: r[key] for key in BASELINE_FIELDS}) for r in results],
+    }
+
+
+def compare_with_baseline(results: List[Dict], baseline: Dict) -> List[str]:
+    """
+    計測結果を基準値と比較する
+
+    戻り値:
+        list: 違いの説明（基準値と同じ場合は空）
+    """
+    differences = []
+    for key, current in (("max_blocks_per_request", MAX_BLOCKS_PER_REQUEST), ("max_request_bytes", MAX_REQUEST_BYTES)):
+        if baseline.get(key) != current:
+            differences.append(f"{key}: {baseline.get(key)} → {current}")
+    expected = {r["name"]: r for r in baseline.get("results", [])}
+    for r in results:
+        before = expected.pop(r["name"], None)
+        if before is None:
+            differences.append(f"{r['name']}: 基準値にないドキュメント")
+            continue
+        for key in BASELINE_FIELDS:
+            if before.get(key) != r[key]:
+                differences.append(f"{r['name']}: {key} {before.get(key)} → {r[key]}")
+    differences.extend(f"{name}: 計測されなかったドキュメント" for name in expected)
+    return differences
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Markdown → Notionブロック変換のベンチマーク")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="結果を保存するJSONファイル")
+    parser.add_argument("--repeat", type=int, default=3, help="各ドキュメントの計測回数（最速値を記録）")
+    parser.add_argument("--no-save", action="store_true", help="結果をファイルに保存しない")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="ブロック数・リクエスト数の基準値のJSONファイル")
+    parser.add_argument("--update-baseline", action="store_true", help="今回の結果で基準値を更新する")
+    args = parser.parse_args(argv)
+
+    previous = {}
+    if os.path.exists(args.output):
+        with open(args.output, "r", encoding="utf-8") as f:
+            previous = {r["name"]: r for r in json.load(f).get("results", [])}
+
+    results = [benchmark_document(name, content, max(1, args.repeat)) for name, content in load_corpus()]
+    _print_comparison(results, previous)
+
+    if not args.no_save:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(terse=True),
+            "max_blocks_per_request": MAX_BLOCKS_PER_REQUEST,
+            "max_request_bytes": MAX_REQUEST_BYTES,
+            "results": results,
+        }
+        _write_json(args.output, report)
+        print(f"結果を保存しました: {args.output}")
+
+    if args.update_baseline:
+        _write_json(args.baseline, _baseline_report(results))
+        print(f"基準値を更新しました: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"警告: 基準値 {args.baseline} がありません（--update-baseline で作成できます）")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        differences = compare_with_baseline(results, json.load(f))
+    if differences:
+        print("基準値と異なる結果があります（意図した変更なら --update-baseline で更新してください）:")
+        for line in differences:
+            print(f" - {line}")
+        return 1
+    print("ブロック数・リクエスト数は基準値と一致しました")
+    return 0
+
+
+def _write_json(path: str, data: Dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+import os
+import threading
+from urllib.parse import urlsplit
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from tracing import span
+
+# Playwright の遅延インポート（利用不可でもインポートエラーにならない）
+PLAYWRIGHT_AVAILABLE = False
+try:
+    from playwright.sync_api import sync_playwright
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    pass
+
+# 同じページ・コンテキストを使い回す回数（超えたら作り直してメモリの増加やCookieの蓄積を防ぐ）
+PLAYWRIGHT_PAGE_MAX_USES = max(1, int(os.environ.get("PLAYWRIGHT_PAGE_MAX_USES", "20")))
+PLAYWRIGHT_CONTEXT_MAX_USES = max(1, int(os.environ.get("PLAYWRIGHT_CONTEXT_MAX_USES", "50")))
+# 使われない状態がこの秒数続いたらブラウザを終了してメモリを解放する（0 の場合は終了しない）
+PLAYWRIGHT_IDLE_SECONDS = float(os.environ.get("PLAYWRIGHT_IDLE_SECONDS", "300"))
+
+# 読み込まずに中断するリソースの種類（本文の取得に使わない画像・動画・フォント。画像のURLはDOMの属性から読む）
+PLAYWRIGHT_BLOCK_RESOURCE_TYPES = frozenset(
+    t.strip() for t in os.environ.get("PLAYWRIGHT_BLOCK_RESOURCE_TYPES", "image,media,font").split(",") if t.strip()
+)
+# 読み込まずに中断するアクセス解析・広告のホスト（サブドメインも含む）
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "ads-twitter.com",
+    "ads-api.twitter.com",
+    "analytics.twitter.com",
+)
+# アクセス解析のAPI（X/Twitterのクライアントが送るログ）
+BLOCKED_PATH_PREFIXES = (
+    "/i/api/1.1/jot/",
+    "/1.1/jot/",
+)
+
+# X/Twitterのページを開くときのブラウザコンテキストの設定
+CONTEXT_OPTIONS = {
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "viewport": {"width": 1280, "height": 900},
+    "locale": "ja-JP",
+}
+
+T = TypeVar("T")
+
+
+class BrowserPool:
+    """
+    起動したままのChromiumでページを使い回すブラウザプール（X/Twitterの取得処理で共有する）
+
+    Playwrightのsync APIのオブジェクトは作成したスレッドからしか使えないため、
+    ブラウザ・コンテキスト・ページはすべて専用のスレッド1つで作成・操作する。
+    呼び出し側は run(func) で処理を渡し、専用スレッド上で func(page) が実行されるのを待つ。
+
+    プールの大きさは意図的に1（コンテキスト・ページ各1つ）にしている。Chromiumのページは1つで
+    数百MBを使うことがあり、512MBのインスタンスでは複数のページを同時に開けないため。
+    処理は1つずつ実行され、backend_limits の "playwright" 枠も1に固定している。
+    """
+
+    def __init__(
+            self,
+            page_max_uses: int = PLAYWRIGHT_PAGE_MAX_USES,
+            context_max_uses: int = PLAYWRIGHT_CONTEXT_MAX_USES,
+            idle_seconds: float = PLAYWRIGHT_IDLE_SECONDS
+    ):
+        self.page_max_uses = page_max_uses
+        self.context_max_uses = context_max_uses
+        self.idle_seconds = idle_seconds
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="playwright")
+
+        # 以下は専用スレッドからのみ操作する
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+        self._context_uses = 0
+        self._page_uses = 0
+
+        self._idle_timer: Optional[threading.Timer] = None
+        self._timer_lock = threading.Lock()
+        self._active = 0  # run の実行中・待機中の呼び出し数
+
+        # 統計情報
+        self.launches = 0
+        self.contexts_created = 0
+        self.pages_created = 0
+        self.uses = 0
+        self.blocked_requests = 0
+
+    def run(self, func: Callable[[Any], T]) -> T:
+        """
+        プールのページで func(page) を実行して結果を返す（完了するまでブロックする）
+
+        func が例外を送出した場合、そのページは状態が不明なため再利用せずに閉じる。
+
+        引数:
+            func: ページを受け取る関数（専用スレッドで実行される）
+
+        戻り値:
+            func の戻り値
+        """
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("Playwrightがインストールされていません。")
+        self._cancel_idle_timer()
+        # トレースのスパンが呼び出し元のジョブに記録されるようコンテキスト変数を引き継ぐ
+        future = self._executor.submit(contextvars.copy_context().run, self._run_on_owner, func)
+        try:
+            return future.result()
+        finally:
+            self._schedule_idle_close()
+
+    def close(self) -> None:
+        """ブラウザを終了する（終了時に呼び出す。次に run が呼ばれた場合は再び起動する）"""
+        with self._timer_lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+        try:
+            self._executor.submit(self._shutdown).result()
+        except RuntimeError:
+            # インタープリター終了処理中はスレッドに処理を渡せない（子プロセスはプロセス終了時に終わる）
+            pass
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._browser is not None,
+            "launches": self.launches,
+            "contexts_created": self.contexts_created,
+            "pages_created": self.pages_created,
+            "uses": self.uses,
+            "blocked_requests": self.blocked_requests,
+        }
+
+    # ---- 以下は専用スレッドで実行する ----
+
+    def _run_on_owner(self, func):
+        page = self._acquire_page()
+        healthy = False
+        try:
+            result = func(page)
+            healthy = True
+            return result
+        finally:
+            if not healthy:
+                self._close_page()
+
+    def _acquire_page(self):
+        if self._browser is not None and not self._browser.is_connected():
+            print("Chromiumとの接続が切れたため再起動します")
+            self._shutdown()
+
+        if self._browser is None:
+            with span("playwright launch"):
+                self._playwright = sync_playwright().start()
+                self._browser = self._playwright.chromium.launch(headless=True)
+            self.launches += 1
+
+        if self._context is not None and self._context_uses >= self.context_max_uses:
+            self._close_context()
+        if self._context is None:
+            self._context = self._browser.new_context(**CONTEXT_OPTIONS)
+            self._context.route("**/*", self._route_request)
+            self._context_uses = 0
+            self.contexts_created += 1
+
+        if self._page is not None and (self._page_uses >= self.page_max_uses or self._page.is_closed()):
+            self._close_page()
+        if self._page is None:
+            self._page = self._context.new_page()
+            self._page_uses = 0
+            self.pages_created += 1
+
+        self._context_uses += 1
+        self._page_uses += 1
+        self.uses += 1
+        return self._page
+
+    def _route_request(self, route) -> None:
+        """本文の取得に不要なリクエスト（画像・動画・フォント・アクセス解析）を中断する"""
+        request = route.request
+        if request.resource_type in PLAYWRIGHT_BLOCK_RESOURCE_TYPES or _is_blocked_url(request.url):
+            self.blocked_requests += 1
+            route.abort()
+        else:
+            route.continue_()
+
+    def _close_page(self) -> None:
+        page, self._page = self._page, None
+        if page is not None:
+            try:
+                page.close()
+            except Exception as e:
+                print(f"ページのクローズ中にエラーが発生: {e}")
+
+    def _close_context(self) -> None:
+        self._close_page()
+        context, self._context = self._context, None
+        if context is not None:
+            try:
+                context.close()
+            except Exception as e:
+                print(f"ブラウザコンテキストのクローズ中にエラーが発生: {e}")
+
+    def _shutdown(self) -> None:
+        self._close_context()
+        browser, self._browser = self._browser, None
+        playwright, self._playwright = self._playwright, None
+        try:
+            if browser is not None:
+                browser.close()
+        except Exception as e:
+            print(f"Chromiumの終了中にエラーが発生: {e}")
+        try:
+            if playwright is not None:
+                playwright.stop()
+        except Exception as e:
+            print(f"Playwrightの終了中にエラーが発生: {e}")
+
+    # ---- アイドル時の終了 ----
+
+    def _cancel_idle_timer(self) -> None:
+        with self._timer_lock:
+            self._active += 1
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+
+    def _schedule_idle_close(self) -> None:
+        with self._timer_lock:
+            self._active -= 1
+            if self.idle_seconds <= 0 or self._active > 0:
+                return
+            self._idle_timer = threading.Timer(self.idle_seconds, self._close_idle)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _close_idle(self) -> None:
+        try:
+            self._executor.submit(self._shutdown_if_idle)
+        except RuntimeError:
+            pass
+
+    def _shutdown_if_idle(self) -> None:
+        if self._browser is not None:
+            print(f"Playwrightのブラウザを{self.idle_seconds:.0f}秒間使用していないため終了します")
+            self._shutdown()
+
+
+def _is_blocked_url(url: str) -> bool:
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if any(host == blocked or host.endswith("." + blocked) for blocked in BLOCKED_HOSTS):
+        return True
+    return parts.path.startswith(BLOCKED_PATH_PREFIXES)
+
+
+# プロセス全体で共有するブラウザプール
+browser_pool = BrowserPool()
@@ -0,0 +1,238 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Iterable, List, Set, TextIO
+
+from tqdm import tqdm
+
+from notion_table import seed_registered_url_index_async, close_notion_clients
+from http_client import close_http_clients
+from browser_pool import browser_pool
+from register_tasks import (
+    STATUS_FAILED, STATUS_REGISTERED, STATUS_SKIPPED, build_register_pipeline, export_trace, new_job, set_notifier,
+)
+from upload_checkpoint import upload_checkpoints
+from url_index import canonicalize_url
+
+# URLリストをまとめてNotionに登録するCLI（Discord Botと同じ登録パイプラインで処理する）
+#
+# 使い方:
+#   python bulk_import.py url_list.txt
+#   cat urls.txt | python bulk_import.py - --concurrency 8
+#
+# 完了したURLは再開ファイルに1行ずつ追記し、中断後に同じコマンドを実行すると未完了のURLから続ける。
+# 失敗したURLは再開ファイルに記録しないため、次回の実行で再度処理する。
+# 外部APIごとの同時実行数（<NAME>_CONCURRENCY）とNotionのレート制限は Discord Bot と同じ設定が適用される。
+
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+BULK_IMPORT_RESUME_FILE = os.environ.get("BULK_IMPORT_RESUME_FILE", os.path.join(DATA_DIR, "bulk_import_done.jsonl"))
+
+# URLの正規表現パターン（Discord Botと同じ）
+URL_PATTERN = r'https?://[^\s)"]+'
+
+# 再開ファイルに記録する（次回以降スキップする）結果
+_FINISHED_STATUSES = (STATUS_REGISTERED, STATUS_SKIPPED)
+
+
+def read_urls(lines: Iterable[str]) -> List[str]:
+    """
+    行ごとのテキストからURLを抽出する（空行と # で始まる行は無視し、重複は除く）
+
+    戻り値:
+        list: 入力順のURL
+    """
+    urls = []
+    seen: Set[str] = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        for url in re.findall(URL_PATTERN, line):
+            key = canonicalize_url(url) or url
+            if key in seen:
+                continue
+            seen.add(key)
+            urls.append(url)
+    return urls
+
+
+def load_finished_urls(path: str) -> Set[str]:
+    """再開ファイルから処理済みのURL（正規化済み）を読み込む"""
+    finished: Set[str] = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断時に書きかけになった行は無視する
+                continue
+            if record.get("status") in _FINISHED_STATUSES:
+                finished.add(canonicalize_url(record["url"]) or record["url"])
+    return finished
+
+
+class BulkImporter:
+    """URLリストを登録パイプラインに流し、結果を再開ファイルと進捗バーに反映する"""
+
+    def __init__(self, urls: List[str], resume_file: TextIO, concurrency: int, write_workers: int, verbose: bool):
+        self.urls = urls
+        self.resume_file = resume_file
+        self.verbose = verbose
+        self.counts = {STATUS_REGISTERED: 0, STATUS_SKIPPED: 0, STATUS_FAILED: 0}
+        self.failed_urls: List[str] = []
+        self.progress = tqdm(total=len(urls), unit="url", dynamic_ncols=True)
+        self._finished = 0
+        self._all_finished = asyncio.Event()
+        self.pipeline = build_register_pipeline(
+            concurrency, concurrency, write_workers, concurrency * 2, on_complete=self._finish_job
+        )
+
+    async def _notify(self, task, message, final=False):
+        """進捗バーの表示を崩さないように通知を出力する（途中経過は --verbose の場合のみ）"""
+        if not final and not self.verbose:
+            return
+        url = task.get('url', '')
+        if url and url not in message:
+            message = f"[{url}] {message}"
+        self.progress.write(message)
+
+    def _finish_job(self, job: Dict) -> None:
+        """パイプラインを抜けたジョブの結果を記録する"""
+        export_trace(job)
+        url = job['task']['url']
+        # 想定外の例外でパイプラインを抜けた場合は状態が記録されていない
+        status = job.get('status', STATUS_FAILED)
+        self.counts[status] += 1
+        if status in _FINISHED_STATUSES:
+            self.resume_file.write(json.dumps(
+                {"url": url, "status": status, "finished_at": time.time()}, ensure_ascii=False
+            ) + "\n")
+            self.resume_file.flush()
+        else:
+            self.failed_urls.append(url)
+
+        self.progress.update(1)
+        self.progress.set_postfix({
+            "登録": self.counts[STATUS_REGISTERED],
+            "スキップ": self.counts[STATUS_SKIPPED],
+            "失敗": self.counts[STATUS_FAILED],
+        })
+        self._finished += 1
+        if self._finished >= len(self.urls):
+            self._all_finished.set()
+
+    async def run(self) -> None:
+        if not self.urls:
+            return
+        set_notifier(self._notify)
+        workers = self.pipeline.start()
+        try:
+            for url in self.urls:
+                # 先頭段のキューが満杯の場合はここで待機する（大量のURLでもメモリを使い過ぎない）
+                await self.pipeline.put(new_job({'type': 'register', 'url': url, 'tags': None}))
+            await self._all_finished.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.progress.close()
+
+
+async def bulk_import_async(
+        urls: List[str],
+        resume_path: str = BULK_IMPORT_RESUME_FILE,
+        concurrency: int = 4,
+        write_workers: int = 2,
+        verbose: bool = False
+) -> Dict[str, int]:
+    """
+    URLリストをNotionに一括登録する
+
+    引数:
+        urls: 登録するURL
+        resume_path: 再開ファイルのパス（記録済みのURLはスキップする）
+        concurrency: 取得・補完の段のワーカー数
+        write_workers: 書き込みの段のワーカー数
+        verbose: 途中経過の通知も表示するかどうか
+
+    戻り値:
+        dict: 結果ごとの件数（今回処理した分のみ）
+    """
+    finished = load_finished_urls(resume_path)
+    pending = [url for url in urls if (canonicalize_url(url) or url) not in finished]
+    print(f"URL {len(urls)}件のうち、処理済み {len(urls) - len(pending)}件をスキップします（再開ファイル: {resume_path}）")
+    if not pending:
+        return {}
+
+    purged = upload_checkpoints.purge()
+    if purged:
+        print(f"古い登録途中のチェックポイント {purged} 件を削除しました")
+
+    # 登録済みのURLは取得やLLM呼び出しの前にスキップできるよう、先にインデックスを読み込む
+    try:
+        await seed_registered_url_index_async()
+    except Exception as e:
+        print(f"登録済みURLのインデックスの読み込みに失敗しました: {e}")
+
+    directory = os.path.dirname(resume_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        with open(resume_path, "a", encoding="utf-8") as resume_file:
+            importer = BulkImporter(pending, resume_file, max(1, concurrency), max(1, write_workers), verbose)
+            await importer.run()
+    finally:
+        await close_notion_clients()
+        await close_http_clients()
+        await asyncio.to_thread(browser_pool.close)
+
+    if importer.failed_urls:
+        print("登録に失敗したURL（もう一度実行すると再試行します）:")
+        for url in importer.failed_urls:
+            print(f" - {url}")
+    return importer.counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="URLリストをNotionに一括登録する")
+    parser.add_argument("input", nargs="?", default="-", help="URLを1行ずつ書いたファイル（- の場合は標準入力）")
+    parser.add_argument("--concurrency", type=int, default=4, help="取得・補完の段のワーカー数")
+    parser.add_argument("--write-workers", type=int, default=2, help="Notionへの書き込みの段のワーカー数")
+    parser.add_argument("--resume-file", default=BULK_IMPORT_RESUME_FILE, help="処理済みのURLを記録するファイル")
+    parser.add_argument("--verbose", action="store_true", help="URLごとの途中経過も表示する")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        urls = read_urls(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            urls = read_urls(f)
+
+    try:
+        counts = asyncio.run(bulk_import_async(
+            urls,
+            resume_path=args.resume_file,
+            concurrency=args.concurrency,
+            write_workers=args.write_workers,
+            verbose=args.verbose,
+        ))
+    except KeyboardInterrupt:
+        print("\n中断しました。同じコマンドをもう一度実行すると未完了のURLから再開します。")
+        return 130
+
+    if counts:
+        print(
+            f"完了: 登録 {counts[STATUS_REGISTERED]}件, スキップ {counts[STATUS_SKIPPED]}件, "
+            f"失敗 {counts[STATUS_FAILED]}件"
+        )
+    return 1 if counts.get(STATUS_FAILED) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,118 @@
 import os
 import re
 import asyncio
-import threading
-import queue
 import discord
 from io import BytesIO
 
 from keep_alive import keep_alive
-from get_site import fetch_and_convert_to_markdown
+from durable_queue import DurableTaskQueue, DEFAULT_LEASE_SECONDS
+from progress_message import ProgressMessageEditor
+from metrics import register_gauge
 from get_youtube import fetch_youtube_info, extract_video_id
 from article_generator import process_youtube_for_notion
-from get_x_post import fetch_x_post
-from get_x_article import fetch_x_article, is_x_article_url
-from notion_table import register_notion_table
-from title_translator import is_non_japanese_title, translate_title
+from notion_table import seed_registered_url_index_async, get_notion_async_client, close_notion_clients
+from http_client import close_http_clients
+from browser_pool import browser_pool
+from upload_checkpoint import upload_checkpoints
+from register_tasks import build_register_pipeline, new_job, export_trace, set_notifier
 
 # 設定
 # WATCH_CHANNEL_IDS: カンマ区切り複数指定可。後方互換として DISCORD_CHANNEL_ID も読む。
 _watch_channel_ids_env = os.environ.get("WATCH_CHANNEL_IDS") or os.environ.get("DISCORD_CHANNEL_ID", "1350334310452039680")
 WATCH_CHANNEL_IDS = [channel_id.strip() for channel_id in _watch_channel_ids_env.split(",") if channel_id.strip()]
 
+# 登録パイプラインの各段（取得・補完・書き込み）のワーカー数（Botのイベントループ上のタスク）
+# バックエンドごとの同時実行数は backend_limits（<NAME>_CONCURRENCY）で個別に制限する
+FETCH_STAGE_WORKERS = max(1, int(os.environ.get("FETCH_STAGE_WORKERS", "8")))
+ENRICH_STAGE_WORKERS = max(1, int(os.environ.get("ENRICH_STAGE_WORKERS", "8")))
+WRITE_STAGE_WORKERS = max(1, int(os.environ.get("WRITE_STAGE_WORKERS", "3")))
+
+# 各段の入力キューの上限
+STAGE_QUEUE_SIZE = max(1, int(os.environ.get("STAGE_QUEUE_SIZE", "16")))
+
+# 各段の統計情報（キューの深さ・スループット）をログ出力する間隔（秒）
+PIPELINE_STATS_INTERVAL = int(os.environ.get("PIPELINE_STATS_INTERVAL", "60"))
+
+# 進捗メッセージの編集をまとめる間隔（秒）。この間隔内の更新は最新の内容だけを反映する
+PROGRESS_EDIT_WINDOW_SECONDS = float(os.environ.get("PROGRESS_EDIT_WINDOW_SECONDS", "2"))
+
+# 永続キューから一度に取り出すタスク数
+TASK_DEQUEUE_BATCH_SIZE = max(1, int(os.environ.get("TASK_DEQUEUE_BATCH_SIZE", "8")))
+
+# パイプラインで処理中のタスクのリースを延長する間隔（秒）。リース期限より十分短くする
+TASK_LEASE_RENEW_SECONDS = float(os.environ.get("TASK_LEASE_RENEW_SECONDS", str(DEFAULT_LEASE_SECONDS / 3)))
+
 # URLの正規表現パターン
 URL_PATTERN = r'https?://[^\s)"]+'
 
-# YouTube URLの判定関数
-def is_youtube_url(url: str) -> bool:
-    """YouTube URLかどうかを判定"""
-    youtube_domains = [
-        'youtube.com',
-        'youtu.be',
-        'www.youtube.com',
-        'm.youtube.com'
-    ]
-    return any(domain in url.lower() for domain in youtube_domains)
-
-# X/Twitter URLの判定関数
-def is_x_url(url: str) -> bool:
-    """X/Twitter URLかどうかを判定"""
-    from urllib.parse import urlparse
-    try:
-        parsed = urlparse(url)
-        hostname = parsed.hostname or ''
-        x_domains = ['x.com', 'twitter.com', 'www.x.com', 'www.twitter.com', 'mobile.twitter.com']
-        return hostname in x_domains
-    except Exception:
-        return False
+# 処理キュー（SQLiteに永続化し、再起動時も未完了タスクを失わない）
+task_queue = DurableTaskQueue()
+
+# 新しいタスクが追加されたことをディスパッチャーに知らせるイベント
+_task_available = asyncio.Event()
+
+# パイプラインに渡してから完了するまでのタスクID（リースを延長し、期限切れでも二重に取り出さない）
+_in_flight_task_ids = set()
+
+# URLごとの進捗メッセージ（1つのメッセージを編集して進捗を表示する）
+progress_editor = ProgressMessageEditor(window_seconds=PROGRESS_EDIT_WINDOW_SECONDS)
+
 
-# 処理キュー
-task_queue = queue.Queue()
+class RegisterBot(discord.Client):
+    """登録パイプラインをイベントループ上で動かすDiscordクライアント"""
+
+    async def setup_hook(self):
+        # 前回の実行中に処理が完了しなかったタスクをキューに戻す
+        requeued = task_queue.requeue_leased()
+        if requeued:
+            print(f"未完了のタスク {requeued} 件をキューに戻しました")
+        purged = upload_checkpoints.purge()
+        if purged:
+            print(f"古い登録途中のチェックポイント {purged} 件を削除しました")
+
+        # Notionクライアントを起動時に作成し、以降の登録で接続を使い回す
+        try:
+            get_notion_async_client()
+        except ValueError as e:
+            print(f"警告: {e}")
+
+        # 登録済みURLのインデックスをバックグラウンドで読み込む
+        self.loop.create_task(_seed_url_index(), name="seed-url-index")
+
+        # バックグラウンド処理タスク（ディスパッチャーと登録パイプライン）の起動
+        register_pipeline.start()
+        self.loop.create_task(dispatch_task_queue(), name="register-dispatcher")
+        self.loop.create_task(renew_task_leases(), name="register-lease-renewer")
+        self.loop.create_task(register_pipeline.report_stats(PIPELINE_STATS_INTERVAL), name="register-pipeline-stats")
+        print(
+            f"登録パイプラインを起動しました（取得: {FETCH_STAGE_WORKERS}, "
+            f"補完: {ENRICH_STAGE_WORKERS}, 書き込み: {WRITE_STAGE_WORKERS}）"
+        )
+
+    async def close(self):
+        # 共有しているNotion・HTTPクライアントの接続とブラウザを閉じてから終了する
+        try:
+            await close_notion_clients()
+            await close_http_clients()
+            await asyncio.to_thread(browser_pool.close)
+        except Exception as e:
+            print(f"クライアントのクローズ中にエラーが発生: {e}")
+        await super().close()
+
+
+async def _seed_url_index():
+    """登録済みURLのインデックスを読み込む（失敗しても登録処理は継続する）"""
+    try:
+        await seed_registered_url_index_async()
+    except Exception as e:
+        print(f"登録済みURLのインデックスの読み込みに失敗しました: {e}")
 
-# 同一メッセージ内で既に取得済みのXポストIDを追跡（重複登録防止）
-# key: message_id, value: set of post IDs
-_message_processed_x_ids = {}
 
 intents = discord.Intents.default()
 intents.message_content = True  # メッセージの内容を取得する権限
 
 # Botをインスタンス化
-bot = discord.Client(intents=intents)
+bot = RegisterBot(intents=intents)
 
 @bot.event
 async def on_ready():
@@ -91,7 +146,7 @@ async def on_message(message):
         
     for url in urls:
         try:
-            # 処理開始メッセージ
+            # 処理開始メッセージ（以降の進捗はこのメッセージを編集して表示する）
             response = await message.channel.send(f"URL `{url}` を検出しました。処理を開始します...")
             
             # バックグラウンド処理のためにキューに追加
@@ -100,171 +155,132 @@ async def on_message(message):
                 'url': url,
                 'tags': None,  # 自動予測
                 'message_id': message.id,
-                'channel_id': message.channel.id
+                'channel_id': message.channel.id,
+                'status_message_id': response.id
             })
+            _task_available.set()
             
         except Exception as e:
             await message.channel.send(f"エラーが発生しました: {str(e)}")
 
-# Discord チャンネルにメッセージを送信するヘルパー関数
-def send_discord_message(channel_id, message):
-    """Discord チャンネルにメッセージを送信する"""
-    try:
-        asyncio.run_coroutine_threadsafe(
-            bot.get_channel(int(channel_id)).send(message),
-            bot.loop
-        )
-    except Exception as e:
-        print(f"メッセージ送信中にエラーが発生: {e}")
+# Discord にタスクの進捗を表示するヘルパー関数
+async def send_discord_message(task, message, final=False):
+    """
+    タスクの進捗メッセージを更新する
 
-# URL登録タスクの処理関数
-def process_register_task(task):
-    """URLを取得してNotionに登録するタスク処理"""
-    channel_id = task['channel_id']
-    url = task['url']
-    tags = task.get('tags')  # タグは省略可能
+    URLごとの進捗メッセージ（status_message_id）を編集して表示する。
+    短時間に続いた更新はまとめて1回の編集にし、final=True（完了・スキップ・エラー）は即座に反映する。
+    進捗メッセージがない場合はチャンネルに新しいメッセージを送信する。
+    """
+    url = task.get('url', '')
+    if url and url not in message:
+        message = f"URL `{url}`\n{message}"
 
     try:
-        # YouTube URLかどうかチェック
-        if is_youtube_url(url):
-            send_discord_message(channel_id, "YouTube動画を検出しました。記事生成はChrome拡張を使ってください。")
-            return
-        elif is_x_article_url(url):
-            # X/Twitter記事（Article）の処理
-            send_discord_message(channel_id, "X/Twitterの記事（Article）を取得しています...")
-            title, content = fetch_x_article(url)
-        elif is_x_url(url):
-            # 同一メッセージ内で既に取得済みのポストIDかチェック
-            post_id_match = re.search(r'/status/(\d+)', url)
-            msg_id = task.get('message_id')
-            if post_id_match and msg_id:
-                post_id = post_id_match.group(1)
-                if msg_id in _message_processed_x_ids and post_id in _message_processed_x_ids[msg_id]:
-                    send_discord_message(channel_id, f"ポスト `{url}` は引用ツイートとして既に登録済みのためスキップします。")
-                    return
-
-            # X/Twitterポストの処理
-            send_discord_message(channel_id, "X/Twitterのポストを取得しています...")
-            title, content, collected_ids = fetch_x_post(url)
-
-            # 取得した全ポストIDを記録（同一メッセージの後続タスクで重複防止）
-            if msg_id and collected_ids:
-                if msg_id not in _message_processed_x_ids:
-                    _message_processed_x_ids[msg_id] = set()
-                _message_processed_x_ids[msg_id].update(collected_ids)
+        channel = bot.get_channel(int(task['channel_id']))
+        status_message_id = task.get('status_message_id')
+        if status_message_id:
+            await progress_editor.update(channel.get_partial_message(status_message_id), message, final=final)
         else:
-            # 通常のWebページの処理
-            status_msg = f"サイトのコンテンツを取得しています..."
-            send_discord_message(channel_id, status_msg)
-            # サイトのタイトルとコンテンツを取得
-            title, content = fetch_and_convert_to_markdown(url)
-
-        if not content:
-            send_discord_message(channel_id, f"❌ コンテンツの取得に失敗しました: {url}")
-            return
-
-        # タイトルの翻訳（英語など日本語以外の場合）
-        original_title = title
-        translated_title = None
-
-        if is_non_japanese_title(title):
-            status_msg = f"タイトルを翻訳しています..."
-            send_discord_message(channel_id, status_msg)
-
-            translated_title = translate_title(title)
-            if translated_title:
-                title = f"{translated_title} (原題: {original_title})"
-
-        # 処理状況の更新
-        status_msg = f"Notionテーブルに登録しています..."
-        send_discord_message(channel_id, status_msg)
+            await channel.send(message)
+    except Exception as e:
+        print(f"メッセージ送信中にエラーが発生: {e}")
 
-        # Notionテーブルに登録
-        page = register_notion_table(content, url=url, title=title, tags=tags)
 
-        # 完了メッセージを送信
-        page_url = page.get("url", "不明")
+# 登録処理の進捗・結果は Discord のメッセージとして通知する
+set_notifier(send_discord_message)
 
-        # タグ情報を取得
+def _finish_job(job):
+    """パイプラインを抜けたジョブの完了を永続キューに通知し、トレースを書き出す"""
+    _in_flight_task_ids.discard(job['task_id'])
+    if 'status' in job:
+        task_queue.ack(job['task_id'])
+    else:
+        # 想定外の例外でパイプラインを抜けた（結果が記録されていない）場合は捨てずにキューに戻して再試行する
+        # （取り出し回数が TASK_MAX_ATTEMPTS に達したら failed になる）
+        task_queue.release(job['task_id'])
+        _task_available.set()
+    # 想定外の例外などで最後の通知がされなかった場合も進捗メッセージの状態を破棄する
+    progress_editor.forget(job['task'].get('status_message_id'))
+    export_trace(job)
+
+
+# 取得 → 補完（翻訳・タグ） → 書き込み の3段パイプライン
+register_pipeline = build_register_pipeline(
+    FETCH_STAGE_WORKERS, ENRICH_STAGE_WORKERS, WRITE_STAGE_WORKERS, STAGE_QUEUE_SIZE, on_complete=_finish_job
+)
+
+
+# /metrics で公開するゲージ（キューの深さと各段の処理状況）
+register_gauge(
+    "register_task_queue_depth",
+    "Unfinished tasks (pending + leased) in the durable register queue.",
+    task_queue.qsize,
+)
+register_gauge(
+    "register_task_queue_failed",
+    "Tasks in the durable register queue that hit the attempt limit and will not be retried.",
+    task_queue.failed_count,
+)
+register_gauge(
+    "register_pipeline_queue_depth",
+    "Jobs waiting in each registration pipeline stage queue.",
+    lambda: [({"stage": s["name"]}, s["queue_depth"]) for s in register_pipeline.snapshot()],
+    ("stage",),
+)
+register_gauge(
+    "register_pipeline_in_flight",
+    "Jobs currently being processed by each registration pipeline stage.",
+    lambda: [({"stage": s["name"]}, s["in_flight"]) for s in register_pipeline.snapshot()],
+    ("stage",),
+)
+
+
+# 永続キューからタスクをまとめてリースし、パイプラインへ渡すディスパッチャー
+async def dispatch_task_queue():
+    """永続キューからタスクをバッチで取り出してパイプラインの先頭に積む"""
+    while True:
         try:
-            # 登録されたタグの取得を試みる（存在すれば）
-            registered_tags = []
-            if "properties" in page and "タグ" in page["properties"] and "multi_select" in page["properties"]["タグ"]:
-                for tag_obj in page["properties"]["タグ"]["multi_select"]:
-                    if "name" in tag_obj:
-                        registered_tags.append(tag_obj["name"])
-
-            if registered_tags:
-                tag_info = f"タグ: {', '.join(registered_tags)}"
-            else:
-                tag_info = "タグ: なし"
-        except:
-            # エラーが発生した場合はシンプルな情報を表示
-            if tags:
-                tag_info = f"タグ: {', '.join(tags)}"
-            else:
-                tag_info = "タグ: 自動予測（詳細不明）"
-
-        # 翻訳情報を表示用に整形
-        title_info = title
-        if translated_title:  # 翻訳された場合
-            title_info = f"**タイトル:** {translated_title}\n**原題:** {original_title}"
-        else:
-            title_info = f"**タイトル:** {title}"
+            # 取り出し前にクリアしておくことで、取り出し後に追加されたタスクの通知を取りこぼさない
+            _task_available.clear()
+            leased = task_queue.get_batch(TASK_DEQUEUE_BATCH_SIZE, exclude_ids=_in_flight_task_ids)
+            if not leased:
+                # 新しいタスクの追加を待つ（リース期限切れのタスクを拾うため定期的にも確認）
+                try:
+                    await asyncio.wait_for(_task_available.wait(), timeout=30)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for task_id, task in leased:
+                if task['type'] != 'register':
+                    print(f"不明なタスクタイプ: {task['type']}")
+                    task_queue.ack(task_id)
+                    continue
+                _in_flight_task_ids.add(task_id)
+                # 先頭段のキューが満杯の場合はここで待機する
+                await register_pipeline.put(new_job(task, task_id))
+        except Exception as e:
+            print(f"タスクの取り出し中にエラーが発生しました: {e}")
+            await asyncio.sleep(5)
 
-        message = f"✅ URLの登録が完了しました!\n{title_info}\n**元URL:** {url}\n**Notion URL:** {page_url}\n**{tag_info}**"
-        send_discord_message(channel_id, message)
 
-    except Exception as e:
-        # 例外発生箇所のファイル名と行番号を付けて通知
-        try:
-            import traceback
-            tb = traceback.extract_tb(e.__traceback__)
-            if tb:
-                filename, lineno, _, _ = tb[-1]
-                error_message = f"❌ 処理中にエラーが発生しました: {str(e)} (ファイル: {filename}, 行: {lineno})"
-            else:
-                error_message = f"❌ 処理中にエラーが発生しました: {str(e)}"
-        except Exception as _:
-            error_message = f"❌ 処理中にエラーが発生しました: {str(e)}"
-        send_discord_message(channel_id, error_message)
-
-
-# バックグラウンド処理用のスレッド関数
-def process_task_queue():
-    """キューからタスクを取得して処理する"""
+async def renew_task_leases():
+    """パイプラインで処理中（キュー待ちを含む）のタスクのリースを定期的に延長する"""
     while True:
+        await asyncio.sleep(TASK_LEASE_RENEW_SECONDS)
+        if not _in_flight_task_ids:
+            continue
         try:
-            # キューからタスクを取得
-            task = task_queue.get()
-            
-            # タスクタイプに応じて適切な処理関数を呼び出す
-            if task['type'] == 'register':
-                process_register_task(task)
-            else:
-                print(f"不明なタスクタイプ: {task['type']}")
-            
-            # タスク完了をキューに通知
-            task_queue.task_done()
-            
-            # 次のタスクまで少し待機（API制限対策）
-            time.sleep(1)
-                
+            task_queue.extend_lease(list(_in_flight_task_ids))
         except Exception as e:
-            print(f"バックグラウンド処理でエラーが発生しました: {e}")
-            # エラーが発生しても継続するために少し待機
-            time.sleep(5)
+            print(f"タスクのリース延長中にエラーが発生しました: {e}")
 
 if __name__ == "__main__":
-    # 必要なライブラリのインポート
-    import time
-    
     print("Discord Bot を起動中...")
     print(f"監視対象チャンネル: {WATCH_CHANNEL_IDS if WATCH_CHANNEL_IDS else '未設定'}")
     
-    # バックグラウンド処理スレッドの起動
-    background_thread = threading.Thread(target=process_task_queue, daemon=True)
-    background_thread.start()
+    # 登録パイプラインは Bot のイベントループ上で起動する（RegisterBot.setup_hook）
     
     # Webサーバー起動（Replit用）
     keep_alive()
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 永続化データの保存先（Render等で永続ディスクがある場合は DATA_DIR で指定）
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+TASK_QUEUE_DB = os.environ.get("TASK_QUEUE_DB", os.path.join(DATA_DIR, "task_queue.sqlite3"))
+
+# リース期限（秒）。この時間内にackされなかったタスクは再取得可能になる
+DEFAULT_LEASE_SECONDS = int(os.environ.get("TASK_LEASE_SECONDS", "900"))
+
+# 取り出し回数の上限。超えたタスク（処理中のクラッシュを繰り返すもの）は failed 状態にして再取得しない
+TASK_MAX_ATTEMPTS = max(1, int(os.environ.get("TASK_MAX_ATTEMPTS", "5")))
+
+
+class DurableTaskQueue:
+    """
+    SQLite（WALモード）に保存する再起動耐性のあるタスクキュー
+
+    put で追加したタスクは get_batch でリース付きで取り出し、処理完了後に ack で削除する。
+    処理に時間がかかるタスクは extend_lease でリースを延長する。
+    ackされずにプロセスが終了したタスクは、次回起動時の requeue_leased で再びキューに戻る。
+    取り出し回数が max_attempts に達したタスクは failed 状態にし、それ以上は取り出さない。
+    """
+
+    def __init__(self, path: str = TASK_QUEUE_DB, max_attempts: int = TASK_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # イベントループとto_threadのワーカー双方から使うため、接続はロックで保護して共有する
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, id)")
+
+    def put(self, task: Dict) -> int:
+        """
+        タスクをキューに追加する
+
+        戻り値:
+            int: 追加したタスクのID
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO tasks (payload, created_at) VALUES (?, ?)",
+                (json.dumps(task, ensure_ascii=False), time.time())
+            )
+            return cursor.lastrowid
+
+    def get_batch(
+            self,
+            max_items: int = 1,
+            lease_seconds: Optional[int] = None,
+            exclude_ids: Iterable[int] = ()
+    ) -> List[Tuple[int, Dict]]:
+        """
+        未処理のタスクを最大 max_items 件までリース付きで取り出す
+
+        リース期限切れのタスク（処理中に長時間応答がないもの）も取り出し対象に含める。
+        取り出し回数が上限に達しているタスクは取り出さずに failed 状態にする。
+
+        引数:
+            max_items: 一度に取り出す最大件数
+            lease_seconds: リース期限（秒）。省略時は DEFAULT_LEASE_SECONDS
+            exclude_ids: 取り出さないタスクID（このプロセスで処理中のタスクなど）
+
+        戻り値:
+            List[Tuple[int, Dict]]: (タスクID, タスク) のリスト（空の場合はキューが空）
+        """
+        lease_seconds = DEFAULT_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        exclude_ids = list(exclude_ids)
+        excluded = f" AND id NOT IN ({', '.join('?' * len(exclude_ids))})" if exclude_ids else ""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                dead = self._conn.execute(
+                    f"""
+                    UPDATE tasks SET status = 'failed', lease_until = NULL
+                    WHERE attempts >= ?
+                      AND (status = 'pending' OR (status = 'leased' AND lease_until < ?)){excluded}
+                    """,
+                    (self.max_attempts, now, *exclude_ids)
+                ).rowcount
+                rows = self._conn.execute(
+                    f"""
+                    SELECT id, payload FROM tasks
+                    WHERE (status = 'pending' OR (status = 'leased' AND lease_until < ?)){excluded}
+                    ORDER BY id
+                    LIMIT ?
+                    """,
+                    (now, *exclude_ids, max_items)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE tasks SET status = 'leased', lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                        [(now + lease_seconds, row[0]) for row in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if dead:
+            print(f"取り出し回数が上限（{self.max_attempts}回）に達したタスク {dead} 件を failed にしました")
+        return [(task_id, json.loads(payload)) for task_id, payload in rows]
+
+    def extend_lease(self, task_ids: Iterable[int], lease_seconds: Optional[int] = None) -> None:
+        """
+        処理中のタスクのリース期限を現在時刻から延長する（処理が続いている間は定期的に呼び出す）
+
+        引数:
+            task_ids: リースを延長するタスクID
+            lease_seconds: 延長後のリース期限（秒）。省略時は DEFAULT_LEASE_SECONDS
+        """
+        lease_seconds = DEFAULT_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        lease_until = time.time() + lease_seconds
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE tasks SET lease_until = ? WHERE id = ? AND status = 'leased'",
+                [(lease_until, task_id) for task_id in task_ids]
+            )
+
+    def ack(self, task_id: int) -> None:
+        """処理が完了したタスクをキューから削除する"""
+        with self._lock:
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def release(self, task_id: int) -> None:
+        """リース中のタスクを未処理状態に戻す（処理が想定外の例外で中断した場合などに、後で再取得させる）"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = 'pending', lease_until = NULL WHERE id = ?",
+                (task_id,)
+            )
+
+    def requeue_leased(self) -> int:
+        """
+        リース中のまま残っているタスクをすべて未処理状態に戻す（起動時に呼び出す）
+
+        戻り値:
+            int: 未処理状態に戻したタスク数
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = 'pending', lease_until = NULL WHERE status = 'leased'"
+            )
+            return cursor.rowcount
+
+    def qsize(self) -> int:
+        """未完了（未処理 + 処理中）のタスク数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks WHERE status != 'failed'").fetchone()[0]
+
+    def failed_count(self) -> int:
+        """取り出し回数の上限に達して failed になったタスク数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks WHERE status = 'failed'").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
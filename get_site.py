@@ -1,36 +1,20 @@
 import os
 import json
+import asyncio
 from dotenv import load_dotenv
-from firecrawl import Firecrawl
+from firecrawl import AsyncFirecrawl
+
+from backend_limits import async_backend_slot
+from metrics import record_api_error, status_of
+from tracing import span
 
 # Firecrawl APIキーを環境変数から取得
 load_dotenv()
 FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
 
 
-def fetch_and_convert_to_markdown(
-        url: str ,
-        cookie_file_path: str = "cookies.json"
-):
-    """
-    指定した URL からクッキーを使用して HTML を取得し、
-    サイトのタイトルとコンテンツを Markdown 文字列として返します。
-
-    引数:
-        url: データを取得するURL
-        cookie_file_path: ブラウザでエクスポートした JSON 形式のクッキーファイル
-
-    戻り値:
-        tuple: (タイトル, 変換されたマークダウンコンテンツ)のタプル
-    """
-    # ★ 追加: APIキー未設定の明示的な検出
-    if not FIRECRAWL_API_KEY:
-        raise EnvironmentError("FIRECRAWL_API_KEY が設定されていません。環境変数を確認してください。")
-
-    # 変更: Firecrawlクライアントを初期化（FirecrawlApp -> Firecrawl）
-    app = Firecrawl(api_key=FIRECRAWL_API_KEY)
-
-    # クッキーファイルを読み込む
+def _load_cookie_headers(cookie_file_path: str) -> dict:
+    """JSON形式のクッキーファイルを読み込み、リクエストヘッダー用の辞書に変換"""
     cookies = {}
     if os.path.exists(cookie_file_path):
         with open(cookie_file_path , 'r' , encoding='utf-8') as f:
@@ -43,14 +27,16 @@ def fetch_and_convert_to_markdown(
 
         if cookie_str:
             cookies = {"Cookie": cookie_str.strip()}
+    return cookies
+
 
-    # 変更: URLからコンテンツを取得（scrape_url -> scrape）
-    response = app.scrape(
-        url,
-        formats=["markdown", "html"],
-        headers=cookies  # v2 APIは headers をサポート
-    )
+def _parse_scrape_response(response, url: str):
+    """
+    Firecrawlのscrapeレスポンスからタイトルとマークダウンを取り出す
 
+    戻り値:
+        tuple: (タイトル, 変換されたマークダウンコンテンツ)のタプル
+    """
     # --- ここから型差異を吸収する共通化処理（最小追加） ---
     def _to_dict(obj):
         """firecrawlの型付きレスポンス(ScrapeResponse等)やPydanticをdictに正規化"""
@@ -133,6 +119,59 @@ def fetch_and_convert_to_markdown(
     return (title, markdown_content)
 
 
+async def fetch_and_convert_to_markdown_async(
+        url: str ,
+        cookie_file_path: str = "cookies.json"
+):
+    """
+    指定した URL からクッキーを使用して HTML を取得し、
+    サイトのタイトルとコンテンツを Markdown 文字列として返します。（非同期版）
+
+    引数:
+        url: データを取得するURL
+        cookie_file_path: ブラウザでエクスポートした JSON 形式のクッキーファイル
+
+    戻り値:
+        tuple: (タイトル, 変換されたマークダウンコンテンツ)のタプル
+    """
+    # ★ 追加: APIキー未設定の明示的な検出
+    if not FIRECRAWL_API_KEY:
+        raise EnvironmentError("FIRECRAWL_API_KEY が設定されていません。環境変数を確認してください。")
+
+    # Firecrawl非同期クライアントを初期化
+    app = AsyncFirecrawl(api_key=FIRECRAWL_API_KEY)
+
+    # クッキーファイルを読み込む
+    cookies = _load_cookie_headers(cookie_file_path)
+
+    # URLからコンテンツを取得
+    async with async_backend_slot("firecrawl"):
+        try:
+            with span("firecrawl scrape", url=url):
+                response = await app.scrape(
+                    url,
+                    formats=["markdown", "html"],
+                    headers=cookies  # v2 APIは headers をサポート
+                )
+        except Exception as e:
+            record_api_error("firecrawl", status_of(e))
+            raise
+
+    return _parse_scrape_response(response, url)
+
+
+def fetch_and_convert_to_markdown(
+        url: str ,
+        cookie_file_path: str = "cookies.json"
+):
+    """
+    指定した URL からサイトのタイトルとコンテンツを Markdown 文字列として返します。（同期版。スクリプト・テスト用）
+
+    引数・戻り値は fetch_and_convert_to_markdown_async と同じ
+    """
+    return asyncio.run(fetch_and_convert_to_markdown_async(url, cookie_file_path))
+
+
 if __name__ == "__main__":
     # 使い方例
     test_url = "https://newsletter.gamediscover.co/p/schedule-is-solo-smash-hit-and-the"
@@ -1,18 +1,32 @@
+import os
 import re
-import time
 from typing import Tuple, Optional, List
 from urllib.parse import urlparse
 
+from backend_limits import backend_slot
+from browser_pool import PLAYWRIGHT_AVAILABLE, browser_pool
+from tracing import span
 
-# Playwright の遅延インポート（利用不可でもインポートエラーにならない）
-PLAYWRIGHT_AVAILABLE = False
-try:
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
+
+# ブラウザは browser_pool で起動したまま使い回す（Playwright が利用不可でもインポートエラーにならない）
+if not PLAYWRIGHT_AVAILABLE:
     print("警告: Playwrightがインストールされていません。X記事の取得にはPlaywrightが必要です。")
 
 
+# 記事本文のブロックのセレクター
+ARTICLE_BLOCK_SELECTOR = (
+    '[class*="longform-header-one"], '
+    '[class*="longform-header-two"], '
+    '[class*="longform-unstyled"], '
+    '[class*="longform-unordered-list-item"], '
+    '[class*="longform-ordered-list-item"], '
+    '[class*="longform-blockquote"]'
+)
+
+# スクロール後に遅延読み込みのブロックが追加されるのを待つ時間（ミリ秒）
+ARTICLE_SCROLL_WAIT_MS = int(os.environ.get("ARTICLE_SCROLL_WAIT_MS", "500"))
+
+
 # X記事URLの正規表現パターン
 X_ARTICLE_URL_PATTERN = re.compile(
     r'https?://(?:www\.)?(?:twitter\.com|x\.com)/\w+/article/(\d+)'
@@ -70,14 +84,7 @@ def _convert_article_dom_to_markdown(page) -> Tuple[str, str, str, str]:
     timestamp = time_el.get_attribute("datetime") if time_el else ""
 
     # コンテンツブロックの取得と変換
-    content_blocks = page.query_selector_all(
-        '[class*="longform-header-one"], '
-        '[class*="longform-header-two"], '
-        '[class*="longform-unstyled"], '
-        '[class*="longform-unordered-list-item"], '
-        '[class*="longform-ordered-list-item"], '
-        '[class*="longform-blockquote"]'
-    )
+    content_blocks = page.query_selector_all(ARTICLE_BLOCK_SELECTOR)
 
     lines = []
     ordered_counter = 0
@@ -170,66 +177,77 @@ def fetch_x_article(url: str) -> Tuple[str, str]:
 
     normalized_url = _normalize_x_url(url)
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
-            viewport={"width": 1280, "height": 900},
-            locale="ja-JP",
-        )
-        page = context.new_page()
+    try:
+        with backend_slot("playwright"):
+            return browser_pool.run(lambda page: _scrape_article_page(page, url, normalized_url))
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"X記事の取得に失敗しました: {e}")
+
+
+def _scroll_until_loaded(page, max_scrolls: int = 10) -> None:
+    """
+    ページ末尾までスクロールし、記事のブロックが新しく追加された場合は続けてスクロールする
 
+    一定時間（ARTICLE_SCROLL_WAIT_MS）待ってもブロックが増えなければ読み込み済みとみなす。
+    """
+    count = len(page.query_selector_all(ARTICLE_BLOCK_SELECTOR))
+    for _ in range(max_scrolls):
+        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
         try:
-            page.goto(normalized_url, wait_until="networkidle", timeout=30000)
-
-            # 記事コンテンツの読み込みを待機
-            try:
-                page.wait_for_selector(
-                    '[class*="longform-unstyled"], [class*="longform-header"]',
-                    timeout=15000
-                )
-            except Exception:
-                raise RuntimeError(
-                    f"記事コンテンツが見つかりません。ログインが必要な可能性があります: {url}"
-                )
-
-            # 遅延読み込みに対応するためページ全体をスクロール
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(1)
-
-            title, author_info, markdown_body, timestamp = _convert_article_dom_to_markdown(page)
-
-            if not title:
-                title = f"X Article by {author_info}" if author_info else "X Article"
-
-            # タイトルから改行を除去
-            title = re.sub(r'[\r\n]+', ' ', title).strip()
-
-            # メタデータヘッダーを含む完全なMarkdownを構築
-            full_lines = []
-            if author_info:
-                full_lines.append(f"**著者**: {author_info}")
-            if timestamp:
-                full_lines.append(f"**公開日時**: {timestamp}")
-            full_lines.append(f"**URL**: {normalized_url}")
-            full_lines.append("")
-            full_lines.append("---")
-            full_lines.append("")
-            full_lines.append(markdown_body)
-
-            content = "\n".join(full_lines)
-            return (title, content)
-
-        except RuntimeError:
-            raise
-        except Exception as e:
-            raise RuntimeError(f"X記事の取得に失敗しました: {e}")
-        finally:
-            browser.close()
+            page.wait_for_function(
+                "([selector, count]) => document.querySelectorAll(selector).length > count",
+                arg=[ARTICLE_BLOCK_SELECTOR, count],
+                timeout=ARTICLE_SCROLL_WAIT_MS,
+            )
+        except Exception:
+            return
+        count = len(page.query_selector_all(ARTICLE_BLOCK_SELECTOR))
+
+
+def _scrape_article_page(page, url: str, normalized_url: str) -> Tuple[str, str]:
+    """プールのページで記事を開き、(タイトル, マークダウンコンテンツ) を返す（browser_pool の専用スレッドで実行）"""
+    # X/Twitterは動画や解析のリクエストが続くため networkidle を待たず、記事の要素の表示を待つ
+    with span("playwright goto", url=normalized_url):
+        page.goto(normalized_url, wait_until="domcontentloaded", timeout=30000)
+
+    # 記事コンテンツの読み込みを待機
+    try:
+        page.wait_for_selector(
+            '[class*="longform-unstyled"], [class*="longform-header"]',
+            timeout=15000
+        )
+    except Exception:
+        raise RuntimeError(
+            f"記事コンテンツが見つかりません。ログインが必要な可能性があります: {url}"
+        )
+
+    # 遅延読み込みに対応するためページ全体をスクロールし、ブロックが追加されなくなるまで待つ
+    _scroll_until_loaded(page)
+
+    title, author_info, markdown_body, timestamp = _convert_article_dom_to_markdown(page)
+
+    if not title:
+        title = f"X Article by {author_info}" if author_info else "X Article"
+
+    # タイトルから改行を除去
+    title = re.sub(r'[\r\n]+', ' ', title).strip()
+
+    # メタデータヘッダーを含む完全なMarkdownを構築
+    full_lines = []
+    if author_info:
+        full_lines.append(f"**著者**: {author_info}")
+    if timestamp:
+        full_lines.append(f"**公開日時**: {timestamp}")
+    full_lines.append(f"**URL**: {normalized_url}")
+    full_lines.append("")
+    full_lines.append("---")
+    full_lines.append("")
+    full_lines.append(markdown_body)
+
+    content = "\n".join(full_lines)
+    return (title, content)
 
 
 if __name__ == "__main__":
@@ -245,3 +263,5 @@ if __name__ == "__main__":
         print(content)
     except Exception as e:
         print(f"エラー: {e}")
+    finally:
+        browser_pool.close()
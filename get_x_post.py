@@ -1,14 +1,18 @@
 import re
-import requests
+import asyncio
+import httpx
 from typing import Tuple, Optional, Dict, List
 
+from backend_limits import backend_slot, async_backend_slot
+from browser_pool import PLAYWRIGHT_AVAILABLE, browser_pool
+from http_client import http_get_async
+from tweet_cache import tweet_cache
+from metrics import record_api_error
+from tracing import span
 
-# Playwright の遅延インポート（フォールバック時のみ使用）
-PLAYWRIGHT_AVAILABLE = False
-try:
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
+
+# Playwright はフォールバック時のみ使用（ブラウザは browser_pool で起動したまま使い回す）
+if not PLAYWRIGHT_AVAILABLE:
     print("警告: Playwrightがインストールされていません。fxtwitter APIのみを使用します。")
 
 # X/Twitter URLの正規表現パターン
@@ -193,13 +197,37 @@ def _format_article_as_markdown(tweet_raw: Dict) -> Tuple[str, str]:
     return (title, content)
 
 
-def _fetch_tweet_raw(url: str) -> Optional[Dict]:
+def _stale_tweet(post_id: Optional[str]) -> Optional[Dict]:
+    """API障害時に期限切れのキャッシュを返す（ない場合は None）"""
+    if not post_id:
+        return None
+    tweet = tweet_cache.get(post_id, allow_stale=True)
+    if tweet is not None:
+        print(f"fxtwitter APIに接続できないため、キャッシュ済みのポストを使います: {post_id}")
+    return tweet
+
+
+async def _fetch_tweet_raw(url: str) -> Optional[Dict]:
     """
     fxtwitter APIから生のtweetオブジェクトを取得
 
+    共有のHTTPクライアント（http_client）を使うため、引用ツイートの連続取得でも接続を使い回す。
+    取得したtweetオブジェクトはポストIDごとにキャッシュし（tweet_cache）、有効期限内は再取得しない。
+    APIが障害（429・5xx・通信エラー）で応答しない場合は、期限切れのキャッシュがあればそれを使う。
+
+    引数:
+        url: ポストURL
+
     戻り値:
         dict: fxtwitter APIのtweetオブジェクト or None
     """
+    post_id_match = re.search(r'/status/(\d+)', url)
+    post_id = post_id_match.group(1) if post_id_match else None
+    if post_id:
+        cached = tweet_cache.get(post_id)
+        if cached is not None:
+            return cached
+
     api_url = re.sub(
         r'https?://(www\.)?(twitter\.com|x\.com|mobile\.twitter\.com)',
         'https://api.fxtwitter.com',
@@ -207,9 +235,14 @@ def _fetch_tweet_raw(url: str) -> Optional[Dict]:
     )
 
     try:
-        response = requests.get(api_url, timeout=15)
+        async with async_backend_slot("fxtwitter"):
+            with span("fxtwitter GET", url=api_url):
+                response = await http_get_async(api_url, backend="fxtwitter", timeout=15)
         if response.status_code != 200:
+            record_api_error("fxtwitter", response.status_code)
             print(f"fxtwitter API エラー: status={response.status_code}")
+            if response.status_code == 429 or response.status_code >= 500:
+                return _stale_tweet(post_id)
             return None
 
         data = response.json()
@@ -218,23 +251,100 @@ def _fetch_tweet_raw(url: str) -> Optional[Dict]:
             print(f"fxtwitter API: tweetフィールドが見つかりません: {url}")
             return None
 
+        if post_id:
+            tweet_cache.set(post_id, tweet)
         return tweet
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
+        record_api_error("fxtwitter")
         print(f"fxtwitter API リクエストエラー: {e}")
-        return None
+        return _stale_tweet(post_id)
     except (ValueError, KeyError) as e:
         print(f"fxtwitter API パースエラー: {e}")
         return None
 
 
-def _collect_all_tweets_from_api(url: str, visited: Optional[set] = None, depth: int = 0) -> List[Dict]:
+def _linked_post_urls(tweet_raw: Dict) -> List[str]:
+    """
+    tweetオブジェクトから、続けて取得するポストのURLを取り出す
+
+    引用ツイートの本体はAPI応答に含まれるため、その先（引用の引用・引用のテキスト中のURL）と
+    テキスト中のURLが対象（_collect_all_tweets_from_api がたどる順）。
+    """
+    urls = []
+    quote = tweet_raw.get("quote")
+    if quote:
+        nested = quote.get("quote")
+        if nested and nested.get("url"):
+            urls.append(nested["url"])
+        urls.extend(f"https://x.com/i/status/{linked_id}" for linked_id in _extract_x_urls_from_text(quote.get("text", "")))
+    urls.extend(f"https://x.com/i/status/{linked_id}" for linked_id in _extract_x_urls_from_text(tweet_raw.get("text", "")))
+    return urls
+
+
+async def _prefetch_tweets(url: str, root_raw: Optional[Dict] = None) -> Dict[str, Optional[Dict]]:
+    """
+    引用ツイートとテキスト中のX URLを幅優先でたどり、同じ深さのポストを並行して取得する
+
+    同時に送るリクエスト数は backend_limits の "fxtwitter" 枠で制限される。
+    取得順に依存しないよう結果はポストIDごとの辞書で返し、並び順は _collect_all_tweets_from_api で決める。
+
+    引数:
+        url: 起点となるポストURL
+        root_raw: 取得済みの起点のtweetオブジェクト（ある場合は再取得しない）
+
+    戻り値:
+        dict: ポストID → tweetオブジェクト（取得に失敗したポストは None）
+    """
+    fetched: Dict[str, Optional[Dict]] = {}
+    # API応答に本体が含まれている引用ツイート（深さ優先の処理でも取得しないため事前取得しない）
+    embedded = set()
+    level = [url]
+    for depth in range(MAX_RECURSION_DEPTH + 1):
+        pending = {}
+        for post_url in level:
+            try:
+                post_id = _extract_post_id(post_url)
+            except ValueError:
+                continue
+            if post_id not in fetched and post_id not in pending and post_id not in embedded:
+                pending[post_id] = post_url
+        if not pending:
+            break
+
+        if depth == 0 and root_raw is not None:
+            results = [root_raw]
+        else:
+            with span("fxtwitter prefetch level", depth=depth, posts=len(pending)):
+                results = await asyncio.gather(*(_fetch_tweet_raw(post_url) for post_url in pending.values()))
+
+        level = []
+        for post_id, tweet_raw in zip(pending, results):
+            fetched[post_id] = tweet_raw
+            if tweet_raw is not None:
+                quote_match = re.search(r'/status/(\d+)', (tweet_raw.get("quote") or {}).get("url", ""))
+                if quote_match:
+                    embedded.add(quote_match.group(1))
+                level.extend(_linked_post_urls(tweet_raw))
+    return fetched
+
+
+async def _collect_all_tweets_from_api(
+        url: str,
+        visited: Optional[set] = None,
+        depth: int = 0,
+        prefetched: Optional[Dict[str, Optional[Dict]]] = None
+) -> List[Dict]:
     """
     fxtwitter APIを使って、引用ツイートとテキスト中のX URLを再帰的にすべて取得
 
+    prefetched（_prefetch_tweets の結果）にあるポストはAPIを呼ばずにその結果を使う。
+    たどる順は深さ優先のままなので、返すポストの並び順は事前取得の有無で変わらない。
+
     引数:
         url: 起点となるポストURL
         visited: 処理済みポストIDのセット（循環防止）
         depth: 現在の再帰深度
+        prefetched: 事前に取得したポストID → tweetオブジェクトの辞書
 
     戻り値:
         list: 取得した全ポストデータのリスト（先頭が元ツイート）
@@ -251,7 +361,10 @@ def _collect_all_tweets_from_api(url: str, visited: Optional[set] = None, depth:
         return []
     visited.add(post_id)
 
-    tweet_raw = _fetch_tweet_raw(url)
+    if prefetched is not None and post_id in prefetched:
+        tweet_raw = prefetched[post_id]
+    else:
+        tweet_raw = await _fetch_tweet_raw(url)
     if tweet_raw is None:
         return []
 
@@ -277,21 +390,21 @@ def _collect_all_tweets_from_api(url: str, visited: Optional[set] = None, depth:
             if nested:
                 nested_url = nested.get("url", "")
                 if nested_url:
-                    result.extend(_collect_all_tweets_from_api(nested_url, visited, depth + 1))
+                    result.extend(await _collect_all_tweets_from_api(nested_url, visited, depth + 1, prefetched))
 
             # 引用ツイートのテキスト中のX URLも再帰取得
             quote_text = quote.get("text", "")
             for linked_id in _extract_x_urls_from_text(quote_text):
                 if linked_id not in visited:
                     linked_url = f"https://x.com/i/status/{linked_id}"
-                    result.extend(_collect_all_tweets_from_api(linked_url, visited, depth + 1))
+                    result.extend(await _collect_all_tweets_from_api(linked_url, visited, depth + 1, prefetched))
 
     # 2. テキスト中のX/Twitter URLを再帰取得
     text = tweet_raw.get("text", "")
     for linked_id in _extract_x_urls_from_text(text):
         if linked_id not in visited:
             linked_url = f"https://x.com/i/status/{linked_id}"
-            result.extend(_collect_all_tweets_from_api(linked_url, visited, depth + 1))
+            result.extend(await _collect_all_tweets_from_api(linked_url, visited, depth + 1, prefetched))
 
     return result
 
@@ -309,60 +422,53 @@ def _fetch_via_playwright(url: str) -> Optional[Dict]:
 
     normalized_url = _normalize_x_url(url)
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
-            viewport={"width": 1280, "height": 900},
-            locale="ja-JP",
-        )
-        page = context.new_page()
+    try:
+        with backend_slot("playwright"):
+            return browser_pool.run(lambda page: _scrape_tweet_page(page, normalized_url))
+    except Exception as e:
+        print(f"Playwright取得エラー: {e}")
+        return None
 
-        try:
-            page.goto(normalized_url, wait_until="networkidle", timeout=30000)
-            page.wait_for_selector('[data-testid="tweetText"]', timeout=15000)
-
-            tweet_text_el = page.query_selector('[data-testid="tweetText"]')
-            text = tweet_text_el.inner_text() if tweet_text_el else ""
-
-            author_el = page.query_selector('[data-testid="User-Name"]')
-            author_raw = author_el.inner_text() if author_el else ""
-            author_parts = author_raw.split("\n") if author_raw else []
-            author_name = author_parts[0].strip() if len(author_parts) > 0 else ""
-            author_handle = ""
-            for part in author_parts:
-                if part.strip().startswith("@"):
-                    author_handle = part.strip().lstrip("@")
-                    break
-
-            time_el = page.query_selector("time")
-            timestamp = time_el.get_attribute("datetime") if time_el else ""
-
-            images = []
-            img_elements = page.query_selector_all('[data-testid="tweetPhoto"] img')
-            for img in img_elements:
-                src = img.get_attribute("src")
-                if src and "pbs.twimg.com" in src:
-                    src = re.sub(r'name=\w+', 'name=large', src)
-                    images.append(src)
-
-            return {
-                "text": text,
-                "author_name": author_name,
-                "author_handle": author_handle,
-                "timestamp": timestamp,
-                "url": normalized_url,
-                "images": images,
-            }
-        except Exception as e:
-            print(f"Playwright取得エラー: {e}")
-            return None
-        finally:
-            browser.close()
+
+def _scrape_tweet_page(page, normalized_url: str) -> Dict:
+    """プールのページでポストを開き、ポストデータを取り出す（browser_pool の専用スレッドで実行）"""
+    # X/Twitterは動画や解析のリクエストが続くため networkidle を待たず、本文の要素の表示を待つ
+    with span("playwright goto", url=normalized_url):
+        page.goto(normalized_url, wait_until="domcontentloaded", timeout=30000)
+        page.wait_for_selector('[data-testid="tweetText"]', timeout=15000)
+
+    tweet_text_el = page.query_selector('[data-testid="tweetText"]')
+    text = tweet_text_el.inner_text() if tweet_text_el else ""
+
+    author_el = page.query_selector('[data-testid="User-Name"]')
+    author_raw = author_el.inner_text() if author_el else ""
+    author_parts = author_raw.split("\n") if author_raw else []
+    author_name = author_parts[0].strip() if len(author_parts) > 0 else ""
+    author_handle = ""
+    for part in author_parts:
+        if part.strip().startswith("@"):
+            author_handle = part.strip().lstrip("@")
+            break
+
+    time_el = page.query_selector("time")
+    timestamp = time_el.get_attribute("datetime") if time_el else ""
+
+    images = []
+    img_elements = page.query_selector_all('[data-testid="tweetPhoto"] img')
+    for img in img_elements:
+        src = img.get_attribute("src")
+        if src and "pbs.twimg.com" in src:
+            src = re.sub(r'name=\w+', 'name=large', src)
+            images.append(src)
+
+    return {
+        "text": text,
+        "author_name": author_name,
+        "author_handle": author_handle,
+        "timestamp": timestamp,
+        "url": normalized_url,
+        "images": images,
+    }
 
 
 def _format_single_tweet(data: Dict) -> List[str]:
@@ -429,9 +535,9 @@ def _format_all_tweets_as_markdown(tweets: List[Dict], original_url: str) -> Tup
     return (title, "\n".join(all_lines))
 
 
-def fetch_x_post(url: str) -> Tuple[str, str, set]:
+async def fetch_x_post_async(url: str) -> Tuple[str, str, set]:
     """
-    X/Twitterのポストを取得し、マークダウンとして返す
+    X/Twitterのポストを取得し、マークダウンとして返す（非同期版）
     引用ツイートやテキスト中のX URLも再帰的に取得する
 
     Tier1: fxtwitter API（高速・軽量・引用ツイート再帰対応）
@@ -449,22 +555,25 @@ def fetch_x_post(url: str) -> Tuple[str, str, set]:
     print(f"fxtwitter APIで取得を試みます: {url}")
 
     # まず生のtweetオブジェクトを取得してArticleかどうかチェック
-    tweet_raw = _fetch_tweet_raw(url)
+    tweet_raw = await _fetch_tweet_raw(url)
     if tweet_raw and tweet_raw.get("article"):
         print("X記事（Article）を検出しました。記事コンテンツを変換します。")
         title, content = _format_article_as_markdown(tweet_raw)
         return (title, content, {post_id})
 
+    # 引用・リンク先のポストを深さごとに並行して取得してから、元の順序で組み立てる
+    prefetched = await _prefetch_tweets(url, tweet_raw)
     visited = set()
-    tweets = _collect_all_tweets_from_api(url, visited)
+    tweets = await _collect_all_tweets_from_api(url, visited, prefetched=prefetched)
 
     if tweets:
         title, content = _format_all_tweets_as_markdown(tweets, url)
         return (title, content, visited)
 
     # Tier 2: Playwright フォールバック（単一ツイートのみ）
+    # sync APIのためイベントループを塞がないよう別スレッドで実行する
     print("fxtwitter APIでの取得に失敗。Playwrightで再試行します...")
-    data = _fetch_via_playwright(url)
+    data = await asyncio.to_thread(_fetch_via_playwright, url)
 
     if data is None:
         raise RuntimeError(
@@ -476,6 +585,15 @@ def fetch_x_post(url: str) -> Tuple[str, str, set]:
     return (title, content, {post_id})
 
 
+def fetch_x_post(url: str) -> Tuple[str, str, set]:
+    """
+    X/Twitterのポストを取得し、マークダウンとして返す（同期版。スクリプト・テスト用）
+
+    引数・戻り値は fetch_x_post_async と同じ
+    """
+    return asyncio.run(fetch_x_post_async(url))
+
+
 if __name__ == "__main__":
     test_urls = [
         "https://x.com/elikinosita/status/1892818905975779378",
@@ -494,3 +612,4 @@ if __name__ == "__main__":
             print(content)
         except Exception as e:
             print(f"エラー: {e}")
+    browser_pool.close()
@@ -1,13 +1,10 @@
 import re
-import yt_dlp
-import requests
-from typing import Optional, Tuple, Dict, Any, List
-import re
 from typing import Optional, Tuple, Dict, Any, List
 
-import requests
 import yt_dlp
 
+from http_client import http_get
+
 
 def extract_video_id(url: str) -> Optional[str]:
     """YouTube URLから動画IDを抽出"""
@@ -82,7 +79,7 @@ def parse_srt_subtitle(srt_content: str) -> str:
 
 def download_and_parse_subtitle(subtitle_url: str, format_type: str = 'vtt') -> Optional[str]:
     """字幕URLからテキストをダウンロードしてパース"""
-    response = requests.get(subtitle_url, timeout=10)
+    response = http_get(subtitle_url, backend="youtube", timeout=10)
     response.raise_for_status()
     content = response.text
 
@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from rate_limiter import backoff_delay, parse_retry_after
+from metrics import API_RETRIES, HTTP_REQUESTS
+from tracing import span
+
+# 外部サイトへのHTTPリクエストで共有するクライアント（fxtwitter API・YouTube字幕など）
+#
+# ホストごとにコネクションプールを分けてKeep-Aliveで接続を使い回し、
+# 429 と 5xx・通信エラーはジッター付きの指数バックオフで再送する（GETのみ扱うため再送しても安全）。
+
+# タイムアウト（秒）
+HTTP_TIMEOUT_SECONDS = float(os.environ.get("HTTP_TIMEOUT_SECONDS", "15"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+
+# ホストごとのコネクションプールの設定
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.environ.get("HTTP_MAX_KEEPALIVE_PER_HOST", "5"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# 再送の最大回数とバックオフの基準時間（秒）。Retry-After はこの上限（秒）までは従う
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BASE_SECONDS = float(os.environ.get("HTTP_RETRY_BASE_SECONDS", "0.5"))
+HTTP_RETRY_MAX_SECONDS = float(os.environ.get("HTTP_RETRY_MAX_SECONDS", "30"))
+
+# HTTP/2 を使う（h2 は requirements.txt に含む。インストールされていない環境では HTTP/1.1 で接続する）
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.environ.get("HTTP2_ENABLED", "1") not in ("0", "false", "False")
+
+# 再送するステータス
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# ホスト（scheme://host:port）ごとのクライアント（同期版はプロセス全体、非同期版はイベントループごと）
+_sync_clients: Dict[str, httpx.Client] = {}
+_sync_clients_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _client_options() -> Dict:
+    return {
+        "timeout": httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "http2": HTTP2_ENABLED,
+        "follow_redirects": True,
+    }
+
+
+def get_http_client(url: str) -> httpx.Client:
+    """URLのホスト用の共有クライアント（同期版）を取得する"""
+    origin = _origin(url)
+    with _sync_clients_lock:
+        client = _sync_clients.get(origin)
+        if client is None or client.is_closed:
+            client = _sync_clients[origin] = httpx.Client(**_client_options())
+        return client
+
+
+def get_async_http_client(url: str) -> httpx.AsyncClient:
+    """
+    URLのホスト用の共有クライアント（非同期版）を取得する
+
+    httpx.AsyncClient の接続は作成したイベントループに紐づくため、イベントループごとに作成する。
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        clients = _async_clients[loop] = {}
+    origin = _origin(url)
+    client = clients.get(origin)
+    if client is None or client.is_closed:
+        client = clients[origin] = httpx.AsyncClient(**_client_options())
+    return client
+
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    if response is not None and response.status_code == 429:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after > 0:
+            return min(retry_after, HTTP_RETRY_MAX_SECONDS)
+    return backoff_delay(attempt, base=HTTP_RETRY_BASE_SECONDS, cap=HTTP_RETRY_MAX_SECONDS)
+
+
+def _should_retry(response: Optional[httpx.Response], attempt: int) -> bool:
+    if attempt >= HTTP_MAX_RETRIES:
+        return False
+    return response is None or response.status_code in _RETRY_STATUSES
+
+
+def http_get(url: str, backend: Optional[str] = None, **kwargs) -> httpx.Response:
+    """
+    共有クライアントでGETリクエストを送る（429・5xx・通信エラーは再送する）
+
+    引数:
+        url: リクエスト先のURL
+        backend: メトリクスに記録するバックエンド名（省略時はホスト名）
+        **kwargs: httpx.Client.get に渡す引数（timeout, params, headers など）
+
+    戻り値:
+        httpx.Response: 最後のレスポンス（再送しても成功しなかった場合はエラーのステータスのまま返す）
+
+    例外:
+        httpx.HTTPError: 再送しても通信エラーが続いた場合
+    """
+    host = urlsplit(url).hostname or ""
+    backend = backend or host
+    client = get_http_client(url)
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = client.get(url, **kwargs)
+            HTTP_REQUESTS.inc(host=host, status=str(response.status_code))
+        except httpx.TransportError:
+            HTTP_REQUESTS.inc(host=host, status="error")
+            if not _should_retry(None, attempt):
+                raise
+        if response is not None and not _should_retry(response, attempt):
+            return response
+
+        delay = _retry_delay(response, attempt)
+        API_RETRIES.inc(backend=backend)
+        status = response.status_code if response is not None else "error"
+        print(f"HTTPリクエストのリトライ待機中（{host}, status={status}, {attempt + 1}回目, {delay:.1f}秒）")
+        with span("http retry wait", host=host, status=status, attempt=attempt + 1):
+            time.sleep(delay)
+        attempt += 1
+
+
+async def http_get_async(url: str, backend: Optional[str] = None, **kwargs) -> httpx.Response:
+    """
+    共有クライアントでGETリクエストを送る（非同期版）
+
+    引数・戻り値・例外は http_get と同じ
+    """
+    host = urlsplit(url).hostname or ""
+    backend = backend or host
+    client = get_async_http_client(url)
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = await client.get(url, **kwargs)
+            HTTP_REQUESTS.inc(host=host, status=str(response.status_code))
+        except httpx.TransportError:
+            HTTP_REQUESTS.inc(host=host, status="error")
+            if not _should_retry(None, attempt):
+                raise
+        if response is not None and not _should_retry(response, attempt):
+            return response
+
+        delay = _retry_delay(response, attempt)
+        API_RETRIES.inc(backend=backend)
+        status = response.status_code if response is not None else "error"
+        print(f"HTTPリクエストのリトライ待機中（{host}, status={status}, {attempt + 1}回目, {delay:.1f}秒）")
+        with span("http retry wait", host=host, status=status, attempt=attempt + 1):
+            await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def close_http_clients() -> None:
+    """共有クライアントの接続をすべて閉じる（終了時に呼び出す）"""
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.pop(loop, {})
+    for client in clients.values():
+        await client.aclose()
+
+    with _sync_clients_lock:
+        sync_clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in sync_clients:
+        client.close()
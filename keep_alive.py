@@ -1,8 +1,10 @@
 import os
 
-from flask import Flask
+from flask import Flask, Response
 from threading import Thread
 
+from metrics import CONTENT_TYPE, render_prometheus
+
 
 # ホスティングしているrenderでbotが落ちないようにするためにサーバーを開けておく
 app = Flask('')
@@ -13,6 +15,11 @@ def home():
     commit = os.environ.get("RENDER_GIT_COMMIT", "unknown")
     return f"I'm alive (commit: {commit})"
 
+@app.route('/metrics')
+def metrics():
+    # Prometheus形式のメトリクス（キューの深さ・各段のレイテンシ・APIエラー数・トークン使用量）
+    return Response(render_prometheus(), content_type=CONTENT_TYPE)
+
 def run():
     app.run(host='0.0.0.0', port=10000)
 
@@ -0,0 +1,486 @@
+import re
+import json
+from itertools import chain
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+# Markdown を Notion ブロックに変換するコンバーター（Notion APIには依存しない純粋な変換処理）
+#
+# iter_markdown_blocks はブロックを1つずつ yield するジェネレーターなので、
+# 呼び出し側は先頭のブロックをアップロードしながら残りを変換できる。
+
+# Notionの制限: リッチテキストは2000文字以下
+MAX_TEXT_LENGTH = 1990
+MAX_BLOCKS_PER_REQUEST = 100  # 1リクエストあたりの最大ブロック数（Notion APIの制限）
+# 1リクエストあたりのペイロードの上限（Notion APIの制限は500KB。リクエスト全体の枠の分だけ余裕を持たせる）
+MAX_REQUEST_BYTES = 450_000
+# 1ブロックの rich_text 配列の最大要素数（Notion APIの制限）
+MAX_RICH_TEXT_SEGMENTS = 100
+# compact_paragraphs でまとめる対象とする短い段落の文字数
+COMPACT_PARAGRAPH_CHARS = 300
+
+# ---- 変換に使う正規表現（モジュール読み込み時に1回だけコンパイル） ----
+_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
+_HEADING_RE = re.compile(r"^(#{1,3})\s+(.*)$")
+_BULLET_RE = re.compile(r"^[-*+]\s+(.*)$")
+_NUMBERED_RE = re.compile(r"^\d+\.\s+(.*)$")
+_TODO_BULLET_RE = re.compile(r"^[-*+]\s+\[( |x|X)\]\s+(.*)$")
+_TODO_NUMBERED_RE = re.compile(r"^\d+\.\s+\[( |x|X)\]\s+(.*)$")
+_QUOTE_RE = re.compile(r"^>\s?(.*)$")
+_IMAGE_RE = re.compile(r"^!\[([^\]]*)\]\((https?://[^\s)]+)\)\s*$")
+# str.splitlines と同じ改行文字
+_LINE_BREAK_RE = re.compile("\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# Notionがサポートする言語のリスト
+NOTION_SUPPORTED_LANGUAGES = frozenset({
+    "abap", "abc", "agda", "arduino", "ascii art", "assembly", "bash", "basic", "bnf",
+    "c", "c#", "c++", "clojure", "coffeescript", "coq", "css", "dart", "dhall", "diff",
+    "docker", "ebnf", "elixir", "elm", "erlang", "f#", "flow", "fortran", "gherkin",
+    "glsl", "go", "graphql", "groovy", "haskell", "hcl", "html", "idris", "java",
+    "javascript", "json", "julia", "kotlin", "latex", "less", "lisp", "livescript",
+    "llvm ir", "lua", "makefile", "markdown", "markup", "matlab", "mathematica",
+    "mermaid", "nix", "notion formula", "objective-c", "ocaml", "pascal", "perl",
+    "php", "plain text", "powershell", "prolog", "protobuf", "purescript", "python",
+    "r", "racket", "reason", "ruby", "rust", "sass", "scala", "scheme", "scss",
+    "shell", "smalltalk", "solidity", "sql", "swift", "toml", "typescript", "vb.net",
+    "verilog", "vhdl", "visual basic", "webassembly", "xml", "yaml", "java/c/c++/c#"
+})
+
+# よく使われる言語のエイリアスマッピング
+_LANGUAGE_ALIASES = {
+    "sh": "shell",
+    "bash": "shell",
+    "zsh": "shell",
+    "js": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "cpp": "c++",
+    "csharp": "c#",
+    "objc": "objective-c",
+    "text": "plain text",
+    "txt": "plain text",
+    "md": "markdown",
+    "yml": "yaml",
+}
+
+
+# ---- ブロック生成ヘルパー（リンク対応） ----
+
+def _split_text_to_rich(text: str, link_url: Optional[str] = None) -> List[dict]:
+    """単一のテキストをMAX_TEXT_LENGTH以下のrich_text配列に分割"""
+    if text == "":
+        return []
+    items = []
+    for i in range(0, len(text), MAX_TEXT_LENGTH):
+        chunk = text[i:i + MAX_TEXT_LENGTH]
+        rt = {"type": "text", "text": {"content": chunk}}
+        if link_url:
+            rt["text"]["link"] = {"url": link_url}
+        items.append(rt)
+    return items
+
+
+def inline_to_rich(text: str) -> List[dict]:
+    """
+    段落等のインライン文字列に含まれる [label](url) を rich_text 配列へ変換。
+    それ以外は通常テキストとして保持。
+    """
+    rich_parts = []
+    pos = 0
+    for m in _LINK_RE.finditer(text):
+        start, end = m.span()
+        # 直前のプレーンテキスト
+        if start > pos:
+            rich_parts.extend(_split_text_to_rich(text[pos:start]))
+        # リンク部分
+        rich_parts.extend(_split_text_to_rich(m.group(1), link_url=m.group(2)))
+        pos = end
+    # 残り
+    if pos < len(text):
+        rich_parts.extend(_split_text_to_rich(text[pos:]))
+    return rich_parts or [{"type": "text", "text": {"content": ""}}]
+
+
+def _paragraph_block_rich(rich_text: List[dict]) -> dict:
+    return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": rich_text}}
+
+
+def _heading_block(level: int, text: str) -> dict:
+    level = max(1, min(level, 3))
+    block_type = f"heading_{level}"
+    return {
+        "object": "block",
+        "type": block_type,
+        block_type: {"rich_text": inline_to_rich(text), "is_toggleable": False},
+    }
+
+
+def _bulleted_item_block_rich(rich_text: List[dict]) -> dict:
+    return {"object": "block", "type": "bulleted_list_item", "bulleted_list_item": {"rich_text": rich_text}}
+
+
+def _numbered_item_block_rich(rich_text: List[dict]) -> dict:
+    return {"object": "block", "type": "numbered_list_item", "numbered_list_item": {"rich_text": rich_text}}
+
+
+def _quote_block_rich(rich_text: List[dict]) -> dict:
+    return {"object": "block", "type": "quote", "quote": {"rich_text": rich_text}}
+
+
+def _todo_block_rich(rich_text: List[dict], checked: bool) -> dict:
+    return {"object": "block", "type": "to_do", "to_do": {"rich_text": rich_text, "checked": checked}}
+
+
+def normalize_code_language(lang_hint: str) -> str:
+    """コードフェンスの言語指定をNotionがサポートする言語名に変換する（不明な場合は "plain text"）"""
+    # 言語ヒントをクリーンアップ（スペースやハイフン以降を削除）
+    lang = (lang_hint or "").strip().lower()
+    # "bash code-line" のような複合的な文字列から最初の単語だけを取得
+    lang = lang.split()[0] if lang else "plain text"
+    lang = lang.split("-")[0] if "-" in lang else lang
+
+    # マッピングを適用
+    lang = _LANGUAGE_ALIASES.get(lang, lang)
+
+    # Notionがサポートする言語でない場合は "plain text" を使用
+    if lang not in NOTION_SUPPORTED_LANGUAGES:
+        lang = "plain text"
+    return lang
+
+
+def _code_block(text: str, lang: str) -> dict:
+    return {"object": "block", "type": "code",
+            "code": {"rich_text": _split_text_to_rich(text), "language": lang}}
+
+
+def _image_block(img_url: str, caption: str = "") -> dict:
+    """Notion画像ブロックを生成"""
+    block = {
+        "object": "block",
+        "type": "image",
+        "image": {
+            "type": "external",
+            "external": {
+                "url": img_url
+            }
+        }
+    }
+    if caption:
+        block["image"]["caption"] = [
+            {
+                "type": "text",
+                "text": {
+                    "content": caption[:MAX_TEXT_LENGTH]
+                }
+            }
+        ]
+    return block
+
+
+def _inline_blocks(text: str, make_block_rich: Callable[[List[dict]], dict]) -> Iterator[dict]:
+    """
+    インライン要素（リンク含む）をMAX_TEXT_LENGTHごとの塊で分割し、ブロックとして yield する。
+    make_block_rich(rich_text) を用いて種類別のブロックを生成。
+    """
+    cur: List[dict] = []
+    cur_len = 0
+    for seg in inline_to_rich(text):  # 各segmentはMAX_TEXT_LENGTH以下
+        seg_len = len(seg["text"]["content"])
+        if cur_len + seg_len > MAX_TEXT_LENGTH and cur:
+            yield make_block_rich(cur)
+            cur = []
+            cur_len = 0
+        cur.append(seg)
+        cur_len += seg_len
+    if cur:
+        yield make_block_rich(cur)
+
+
+def _long_text_blocks(text: str, make_block_str: Callable[[str], dict]) -> Iterator[dict]:
+    """プレーンテキスト（主にコードの分割用）をMAX_TEXT_LENGTHごとに分割して yield する"""
+    for i in range(0, len(text), MAX_TEXT_LENGTH):
+        yield make_block_str(text[i:i + MAX_TEXT_LENGTH])
+
+
+def iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """
+    Markdownを1行ずつ取り出す（文字列全体の splitlines() コピーを作らない）
+
+    引数:
+        source: Markdown文字列、または行のイテラブル（ファイルオブジェクトなど。末尾の改行は除去する）
+    """
+    if isinstance(source, str):
+        pos = 0
+        for m in _LINE_BREAK_RE.finditer(source):
+            yield source[pos:m.start()]
+            pos = m.end()
+        if pos < len(source):
+            yield source[pos:]
+    else:
+        for line in source:
+            yield line.rstrip("\r\n")
+
+
+# ---- 簡易Markdownパーサ ----
+
+def iter_markdown_blocks(source: Union[str, Iterable[str]]) -> Iterator[dict]:
+    """
+    MarkdownをNotionブロックに変換し、1つずつ yield する
+
+    行単位で処理し、段落・コードブロック以外はバッファしないため、
+    入力全体を変換し終える前に先頭のブロックから順に受け取れる。
+
+    引数:
+        source: Markdown文字列、または行のイテラブル（ファイルオブジェクトなど）
+
+    戻り値:
+        Iterator[dict]: Notionブロック
+    """
+    in_code = False
+    code_lang = ""
+    code_buf: List[str] = []
+    para_buf: List[str] = []
+
+    def flush_paragraph() -> Iterator[dict]:
+        text = "\n".join(para_buf).strip()
+        para_buf.clear()
+        if text:
+            yield from _inline_blocks(text, _paragraph_block_rich)
+
+    def flush_code() -> Iterator[dict]:
+        code_text = "\n".join(code_buf)
+        code_buf.clear()
+        if code_text:
+            lang = normalize_code_language(code_lang)
+            yield from _long_text_blocks(code_text, lambda t: _code_block(t, lang))
+
+    for line in chain(iter_lines(source), [""]):  # 最後にフラッシュ用の空行を追加
+        # コードフェンス開始/終了
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            if not in_code:
+                # 開始：先に現在の段落をフラッシュ
+                yield from flush_paragraph()
+                in_code = True
+                code_lang = stripped[3:].strip()  # ```lang
+                code_buf.clear()
+            else:
+                # 終了
+                in_code = False
+                yield from flush_code()
+                code_lang = ""
+            continue
+
+        if in_code:
+            code_buf.append(line)
+            continue
+
+        # 空行はセクション区切り（段落フラッシュ）
+        if stripped == "":
+            yield from flush_paragraph()
+            continue
+
+        # 見出し
+        m_h = _HEADING_RE.match(stripped)
+        if m_h:
+            yield from flush_paragraph()
+            level = len(m_h.group(1))
+            heading_text = m_h.group(2).strip()
+            if heading_text:
+                yield _heading_block(level, heading_text[:MAX_TEXT_LENGTH])
+                rest = heading_text[MAX_TEXT_LENGTH:]
+                if rest:
+                    yield from _inline_blocks(rest, _paragraph_block_rich)
+            continue
+
+        # 引用
+        m_q = _QUOTE_RE.match(line)
+        if m_q:
+            yield from flush_paragraph()
+            yield from _inline_blocks(m_q.group(1).strip(), _quote_block_rich)
+            continue
+
+        # チェックボックス（to_do）
+        m_t = _TODO_BULLET_RE.match(line) or _TODO_NUMBERED_RE.match(line)
+        if m_t:
+            yield from flush_paragraph()
+            checked = m_t.group(1).lower() == "x"
+            # 文字数オーバー時は複数のto_doに分割（checkedは維持）
+            yield from _inline_blocks(m_t.group(2).strip(), lambda rich: _todo_block_rich(rich, checked))
+            continue
+
+        # 箇条書き（通常）
+        m_b = _BULLET_RE.match(line)
+        if m_b:
+            yield from flush_paragraph()
+            yield from _inline_blocks(m_b.group(1).strip(), _bulleted_item_block_rich)
+            continue
+
+        # 番号付き
+        m_n = _NUMBERED_RE.match(line)
+        if m_n:
+            yield from flush_paragraph()
+            yield from _inline_blocks(m_n.group(1).strip(), _numbered_item_block_rich)
+            continue
+
+        # 画像
+        m_img = _IMAGE_RE.match(stripped)
+        if m_img:
+            yield from flush_paragraph()
+            yield _image_block(m_img.group(2), m_img.group(1))
+            continue
+
+        # それ以外は通常段落の一部としてバッファ
+        para_buf.append(line)
+
+    # 念のため最後の残りをフラッシュ（閉じられていないコードフェンスも出力する）
+    if in_code:
+        yield from flush_code()
+    yield from flush_paragraph()
+
+
+def markdown_to_blocks(source: Union[str, Iterable[str]]) -> List[dict]:
+    """MarkdownをNotionブロックのリストに変換する（iter_markdown_blocks の結果をまとめて返す）"""
+    return list(iter_markdown_blocks(source))
+
+
+# ---- 段落のまとめ（任意のコンパクション） ----
+
+def _is_plain_segment(segment: dict) -> bool:
+    """リンクや装飾のない通常テキストの rich_text 要素かどうか"""
+    return set(segment) == {"type", "text"} and set(segment["text"]) == {"content"}
+
+
+def _append_segment(rich_text: List[dict], segment: dict) -> None:
+    """rich_text に要素を追加する（通常テキスト同士は1つの要素に連結して要素数を抑える）"""
+    if (
+        rich_text
+        and _is_plain_segment(rich_text[-1])
+        and _is_plain_segment(segment)
+        and len(rich_text[-1]["text"]["content"]) + len(segment["text"]["content"]) <= MAX_TEXT_LENGTH
+    ):
+        rich_text[-1] = {"type": "text", "text": {"content": rich_text[-1]["text"]["content"] + segment["text"]["content"]}}
+    else:
+        rich_text.append(segment)
+
+
+def _compactable_rich_text(block: dict, max_paragraph_chars: int) -> Optional[List[dict]]:
+    """まとめてよい短い段落ブロックなら rich_text を返す（それ以外は None）"""
+    if block.get("type") != "paragraph" or set(block["paragraph"]) != {"rich_text"}:
+        return None
+    rich_text = block["paragraph"]["rich_text"]
+    if sum(len(segment["text"]["content"]) for segment in rich_text) > max_paragraph_chars:
+        return None
+    return rich_text
+
+
+def compact_paragraphs(
+        blocks: Iterable[dict],
+        max_paragraph_chars: int = COMPACT_PARAGRAPH_CHARS,
+        separator: str = "\n\n"
+) -> Iterator[dict]:
+    """
+    連続する短い段落ブロックを1つの段落ブロックにまとめる（ブロック数と追加リクエスト数を減らす）
+
+    各段落の rich_text（リンクを含む）はそのまま連結し、段落の間には separator を挟む。
+    まとめたブロックも文字数（MAX_TEXT_LENGTH）と rich_text の要素数（MAX_RICH_TEXT_SEGMENTS）の上限内に収める。
+    段落以外のブロックと長い段落はそのまま出力し、前後の段落はまとめない。
+
+    引数:
+        blocks: iter_markdown_blocks などが返すブロックのイテラブル
+        max_paragraph_chars: まとめる対象とする段落の最大文字数
+        separator: まとめた段落の間に挟む文字列
+
+    戻り値:
+        Iterator[dict]: ブロック
+    """
+    merged: Optional[List[dict]] = None
+    merged_chars = 0
+    separator_segment = {"type": "text", "text": {"content": separator}}
+
+    for block in blocks:
+        rich_text = _compactable_rich_text(block, max_paragraph_chars)
+        if rich_text is None:
+            if merged is not None:
+                yield _paragraph_block_rich(merged)
+                merged = None
+            yield block
+            continue
+
+        chars = sum(len(segment["text"]["content"]) for segment in rich_text)
+        if (
+            merged is not None
+            and merged_chars + len(separator) + chars <= MAX_TEXT_LENGTH
+            and len(merged) + len(rich_text) + 1 <= MAX_RICH_TEXT_SEGMENTS
+        ):
+            _append_segment(merged, separator_segment)
+            for segment in rich_text:
+                _append_segment(merged, segment)
+            merged_chars += len(separator) + chars
+            continue
+
+        if merged is not None:
+            yield _paragraph_block_rich(merged)
+        merged = []
+        for segment in rich_text:
+            _append_segment(merged, segment)
+        merged_chars = chars
+
+    if merged is not None:
+        yield _paragraph_block_rich(merged)
+
+
+class BlockBatch(NamedTuple):
+    """1回のリクエストで送るブロックのまとまり"""
+    blocks: List[dict]
+    size_bytes: int   # ブロック部分のJSONのバイト数
+    max_blocks: int   # このバッチに使えたブロック数の上限
+    max_bytes: int    # このバッチに使えたバイト数の上限
+
+    @property
+    def block_fill(self) -> float:
+        return len(self.blocks) / self.max_blocks if self.max_blocks else 1.0
+
+    @property
+    def byte_fill(self) -> float:
+        return self.size_bytes / self.max_bytes if self.max_bytes else 1.0
+
+
+def payload_size(obj) -> int:
+    """JSONとして送信したときのバイト数（httpx と同じくコンパクト形式・UTF-8）"""
+    return len(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def iter_block_batches(
+        blocks: Iterable[dict],
+        max_blocks: int = MAX_BLOCKS_PER_REQUEST,
+        max_bytes: int = MAX_REQUEST_BYTES,
+        reserved_blocks: int = 0,
+        reserved_bytes: int = 0
+) -> Iterator[BlockBatch]:
+    """
+    ブロック数とペイロードのバイト数の両方の上限まで詰めたバッチに分ける（必要な分だけ変換を進める）
+
+    引数:
+        blocks: ブロックのイテラブル
+        max_blocks: 1バッチのブロック数の上限
+        max_bytes: 1バッチのバイト数の上限
+        reserved_blocks: 最初のバッチだけ他の用途に使うブロック数（ページ作成時の導入文など）
+        reserved_bytes: 最初のバッチだけ他の用途に使うバイト数（ページのプロパティなど）
+
+    戻り値:
+        Iterator[BlockBatch]: バッチ（1ブロックだけで上限を超える場合はそのブロック単独のバッチ）
+    """
+    limit_blocks = max(1, max_blocks - reserved_blocks)
+    limit_bytes = max(1, max_bytes - reserved_bytes)
+    batch: List[dict] = []
+    size = 2  # 配列の括弧
+    for block in blocks:
+        block_size = payload_size(block) + 1  # 区切りのカンマ
+        if batch and (len(batch) >= limit_blocks or size + block_size > limit_bytes):
+            yield BlockBatch(batch, size, limit_blocks, limit_bytes)
+            limit_blocks, limit_bytes = max_blocks, max_bytes
+            batch, size = [], 2
+        batch.append(block)
+        size += block_size
+    if batch:
+        yield BlockBatch(batch, size, limit_blocks, limit_bytes)
@@ -0,0 +1,267 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Prometheus テキスト形式（version 0.0.4）のContent-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# レイテンシ計測用のバケット（秒）。外部API呼び出しは数十秒かかることもあるため上限を広めに取る
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+    metric_type = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """値の分布（主にレイテンシ）を記録するヒストグラム"""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [各バケットの件数, 合計, 件数]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """with ブロックの実行時間を記録する（例外が発生した場合も記録する）"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items()]
+        lines = []
+        for key, (bucket_counts, total, count) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = dict(labels, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """
+    出力時にコールバックで値を取得するゲージ
+
+    コールバックは数値、または (ラベルの辞書, 数値) のリストを返す。
+    """
+    metric_type = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback: Callable, label_names: Iterable[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self.callback = callback
+
+    def _samples(self) -> List[str]:
+        try:
+            result = self.callback()
+        except Exception as e:
+            print(f"メトリクス {self.name} の取得に失敗しました: {e}")
+            return []
+        if isinstance(result, (int, float)):
+            return [f"{self.name} {_format_value(result)}"]
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in result]
+
+
+def register_gauge(name: str, help_text: str, callback: Callable, label_names: Iterable[str] = ()) -> CallbackGauge:
+    """出力時にコールバックで値を取得するゲージを登録する"""
+    return CallbackGauge(name, help_text, callback, label_names)
+
+
+class CallbackCounter(CallbackGauge):
+    """出力時にコールバックで値を取得するカウンター（他のオブジェクトが数えている単調増加の値を公開する）"""
+    metric_type = "counter"
+
+
+def register_counter(name: str, help_text: str, callback: Callable, label_names: Iterable[str] = ()) -> CallbackCounter:
+    """出力時にコールバックで値を取得するカウンターを登録する（name は _total で終わるようにする）"""
+    return CallbackCounter(name, help_text, callback, label_names)
+
+
+def render_prometheus() -> str:
+    """登録済みのすべてのメトリクスをPrometheusテキスト形式で出力する"""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# ---- 共通メトリクス ----
+
+STAGE_DURATION = Histogram(
+    "register_stage_duration_seconds",
+    "Latency of each registration stage (fetch by source, translate, tag, notion_create, notion_append).",
+    ("stage", "source"),
+)
+
+API_ERRORS = Counter(
+    "external_api_errors_total",
+    "Errors returned by external APIs.",
+    ("backend", "status"),
+)
+
+API_RATE_LIMITED = Counter(
+    "external_api_rate_limited_total",
+    "HTTP 429 responses returned by external APIs.",
+    ("backend",),
+)
+
+API_RETRIES = Counter(
+    "external_api_retries_total",
+    "Requests to external APIs that were retried after an error.",
+    ("backend",),
+)
+
+HTTP_REQUESTS = Counter(
+    "http_client_requests_total",
+    "Requests sent through the shared HTTP client, including retries.",
+    ("host", "status"),
+)
+
+TWEET_CACHE_LOOKUPS = Counter(
+    "tweet_cache_lookups_total",
+    "Lookups in the fxtwitter tweet cache (hit, miss, or stale entry served during an outage).",
+    ("result",),
+)
+
+NOTION_BATCH_FILL = Histogram(
+    "notion_batch_fill_ratio",
+    "How full each Notion block batch was relative to its block-count and payload-size limits.",
+    ("limit",),
+    buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM token usage reported by the API.",
+    ("model", "kind"),
+)
+
+
+def status_of(error: BaseException) -> Optional[int]:
+    """例外からHTTPステータスコードを取り出す（取り出せない場合は None）"""
+    for attr in ("status_code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def record_api_error(backend: str, status: Optional[int] = None) -> None:
+    """
+    外部APIのエラーを記録する
+
+    引数:
+        backend: バックエンド名（firecrawl / fxtwitter / notion / gemini / openai など）
+        status: HTTPステータスコード（不明な場合は None）
+    """
+    API_ERRORS.inc(backend=backend, status=str(status) if status is not None else "error")
+    if status == 429:
+        API_RATE_LIMITED.inc(backend=backend)
+
+
+def record_llm_usage(model: str, usage) -> None:
+    """LLMレスポンスの usage（prompt_tokens / completion_tokens など）を記録する"""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = getattr(usage, kind, None)
+        if isinstance(value, int):
+            LLM_TOKENS.inc(value, model=model, kind=kind.replace("_tokens", ""))
+
+    # 推論トークンは completion_tokens_details の中にある（古い形式では usage 直下）
+    details = getattr(usage, "completion_tokens_details", None)
+    reasoning = getattr(details, "reasoning_tokens", None)
+    if reasoning is None:
+        reasoning = getattr(usage, "reasoning_tokens", None)
+    if isinstance(reasoning, int):
+        LLM_TOKENS.inc(reasoning, model=model, kind="reasoning")
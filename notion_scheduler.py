@@ -0,0 +1,117 @@
+import os
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import httpx
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+from backend_limits import async_backend_slot
+from rate_limiter import TokenBucket, backoff_delay, parse_retry_after
+from metrics import API_RETRIES, record_api_error, register_counter, register_gauge, status_of
+from tracing import span
+
+# Notion APIのレート制限（平均3リクエスト/秒）に合わせたトークンバケットの設定
+NOTION_REQUESTS_PER_SECOND = float(os.environ.get("NOTION_REQUESTS_PER_SECOND", "3"))
+NOTION_BURST = float(os.environ.get("NOTION_BURST", "3"))
+# 429などでリトライする最大回数
+NOTION_MAX_RETRIES = int(os.environ.get("NOTION_MAX_RETRIES", "5"))
+# Retry-After がない場合のバックオフの基準時間（秒）
+NOTION_RETRY_BASE_SECONDS = float(os.environ.get("NOTION_RETRY_BASE_SECONDS", "1"))
+
+# サーバー側で処理されていない可能性が高く、安全に再送できるステータス
+_RETRY_ALWAYS = {429}
+# 読み込み系（idempotent=True）のリクエストのみ再送するステータス
+# （ページ作成やブロック追加は処理済みの場合に重複するため再送しない）
+_RETRY_IF_IDEMPOTENT = {500, 502, 503, 504}
+
+# プロセス全体（すべての登録処理）で共有するトークンバケット
+notion_rate_limiter = TokenBucket(NOTION_REQUESTS_PER_SECOND, NOTION_BURST)
+
+# /metrics で公開するトークンバケットの状態と統計情報
+register_gauge(
+    "notion_rate_limiter_tokens",
+    "Tokens currently available in the shared Notion token bucket (negative when requests are queued).",
+    lambda: notion_rate_limiter.stats()["tokens"],
+)
+register_gauge(
+    "notion_rate_limiter_paused_seconds",
+    "Seconds left in the Retry-After pause of the shared Notion token bucket.",
+    lambda: notion_rate_limiter.stats()["paused_seconds"],
+)
+register_counter(
+    "notion_rate_limiter_acquired_total",
+    "Tokens handed out by the shared Notion token bucket.",
+    lambda: notion_rate_limiter.acquired,
+)
+register_counter(
+    "notion_rate_limiter_waited_total",
+    "Notion requests that had to wait for a token.",
+    lambda: notion_rate_limiter.waited,
+)
+register_counter(
+    "notion_rate_limiter_wait_seconds_total",
+    "Total time Notion requests spent waiting for a token.",
+    lambda: notion_rate_limiter.wait_seconds,
+)
+register_counter(
+    "notion_rate_limiter_pauses_total",
+    "Retry-After pauses applied to the shared Notion token bucket.",
+    lambda: notion_rate_limiter.pauses,
+)
+
+
+def _is_retryable(error: Exception, idempotent: bool) -> bool:
+    status = status_of(error)
+    if status in _RETRY_ALWAYS:
+        return True
+    if not idempotent:
+        return False
+    return status in _RETRY_IF_IDEMPOTENT or isinstance(error, (RequestTimeoutError, httpx.TransportError))
+
+
+async def notion_request(
+        func: Callable[..., Awaitable[Any]],
+        *args,
+        idempotent: bool = False,
+        **kwargs
+) -> Any:
+    """
+    Notion APIを共有のレート制限の下で呼び出す
+
+    - 同時実行数は backend_limits の "notion" 枠、リクエスト頻度はトークンバケットで制限する
+    - 429 の場合は Retry-After の間すべてのNotionリクエストを止めてから再送する
+    - Retry-After がない場合はジッター付きの指数バックオフで再送する
+
+    引数:
+        func: 呼び出すNotionクライアントのメソッド（例: notion.pages.create）
+        idempotent: 読み込み系のリクエストかどうか（True の場合は 5xx とタイムアウトも再送する）
+        *args, **kwargs: func に渡す引数
+
+    戻り値:
+        func の戻り値
+    """
+    attempt = 0
+    while True:
+        try:
+            async with async_backend_slot("notion"):
+                await notion_rate_limiter.acquire_async()
+                return await func(*args, **kwargs)
+        except (HTTPResponseError, RequestTimeoutError, httpx.TransportError) as e:
+            status = status_of(e)
+            record_api_error("notion", status)
+            if attempt >= NOTION_MAX_RETRIES or not _is_retryable(e, idempotent):
+                raise
+
+            retry_after = parse_retry_after(getattr(e, "headers", {}).get("Retry-After")) if status == 429 else 0.0
+            if retry_after > 0:
+                # 他の登録処理のリクエストも含めて止める
+                notion_rate_limiter.pause(retry_after)
+                delay = retry_after
+            else:
+                delay = backoff_delay(attempt, base=NOTION_RETRY_BASE_SECONDS)
+
+            API_RETRIES.inc(backend="notion")
+            print(f"Notion APIのリトライ待機中（status={status}, {attempt + 1}回目, {delay:.1f}秒）: {e}")
+            with span("notion retry wait", status=status, attempt=attempt + 1):
+                await asyncio.sleep(delay)
+            attempt += 1
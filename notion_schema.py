@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import weakref
+from typing import Dict, List, Optional
+
+from notion_scheduler import notion_request
+
+# データベースのスキーマ（プロパティとタグの選択肢）を取得し直す間隔（秒）
+NOTION_SCHEMA_REFRESH_SECONDS = float(os.environ.get("NOTION_SCHEMA_REFRESH_SECONDS", "3600"))
+# データベースにまだないタグ（選択肢）を新しく作成してよいか
+# 0 の場合は既存の選択肢にないタグを送信前に取り除く
+NOTION_ALLOW_NEW_TAGS = os.environ.get("NOTION_ALLOW_NEW_TAGS", "1") not in ("0", "false", "False")
+
+# Notion APIの制限
+MAX_PROPERTY_TEXT_LENGTH = 2000   # タイトルなどのテキスト
+MAX_URL_LENGTH = 2000             # URLプロパティ
+MAX_SELECT_OPTION_LENGTH = 100    # セレクトの選択肢名（カンマは使えない）
+
+
+class DatabaseSchema:
+    """Notionデータベースのプロパティ定義（databases.retrieve の結果）"""
+
+    def __init__(self, database: Dict):
+        self.properties: Dict[str, Dict] = database.get("properties", {})
+        self.fetched_at = time.monotonic()
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.fetched_at > NOTION_SCHEMA_REFRESH_SECONDS
+
+    def property_type(self, name: str) -> Optional[str]:
+        prop = self.properties.get(name)
+        return prop.get("type") if prop else None
+
+    @property
+    def title_property(self) -> Optional[str]:
+        """タイトル型のプロパティ名（データベースに必ず1つある）"""
+        for name, prop in self.properties.items():
+            if prop.get("type") == "title":
+                return name
+        return None
+
+    def select_options(self, name: str) -> List[str]:
+        """セレクト / マルチセレクトのプロパティの既存の選択肢"""
+        prop = self.properties.get(name) or {}
+        config = prop.get(prop.get("type"), {}) or {}
+        return [option["name"] for option in config.get("options", []) if "name" in option]
+
+    def _validate_multi_select(self, name: str, value: Dict) -> Dict:
+        existing = set(self.select_options(name))
+        names = []
+        for option in value.get("multi_select", []):
+            # カンマは選択肢名に使えないため置き換え、長すぎる名前は切り詰める
+            option_name = option.get("name", "").replace(",", " ").strip()[:MAX_SELECT_OPTION_LENGTH]
+            if not option_name or option_name in names:
+                continue
+            if option_name not in existing and not NOTION_ALLOW_NEW_TAGS:
+                print(f"警告: {name} に存在しない選択肢のため除外します: {option_name}")
+                continue
+            names.append(option_name)
+        return {"multi_select": [{"name": option_name} for option_name in names]}
+
+    def validate_properties(self, properties: Dict) -> Dict:
+        """
+        ページ作成用のプロパティをスキーマに照らして検証・補正する
+
+        - タイトルのプロパティ名が変わっている場合は現在のタイトル型プロパティに付け替える
+        - データベースにない・型が異なるプロパティは送信すると400エラーになるため取り除く
+        - 文字数の上限を超える値は切り詰める（URLは切り詰めると壊れるため取り除く）
+
+        戻り値:
+            dict: 補正したプロパティ
+
+        例外:
+            ValueError: データベースにタイトル型のプロパティが見つからない場合
+        """
+        validated = {}
+        for name, value in properties.items():
+            value_type = next(iter(value))
+            schema_type = self.property_type(name)
+
+            if value_type == "title":
+                title_name = name if schema_type == "title" else self.title_property
+                if title_name is None:
+                    raise ValueError("Notionデータベースにタイトルのプロパティが見つかりません。")
+                if title_name != name:
+                    print(f"警告: タイトルのプロパティ名が変更されています: {name} → {title_name}")
+                validated[title_name] = {
+                    "title": [
+                        dict(item, text=dict(item["text"], content=item["text"]["content"][:MAX_PROPERTY_TEXT_LENGTH]))
+                        for item in value["title"]
+                    ]
+                }
+                continue
+
+            if schema_type != value_type:
+                print(f"警告: プロパティ {name}（{value_type}）がデータベースにないため除外します（現在の型: {schema_type}）")
+                continue
+
+            if value_type == "url":
+                if value["url"] and len(value["url"]) > MAX_URL_LENGTH:
+                    print(f"警告: URLが長すぎるため {name} を除外します（{len(value['url'])}文字）")
+                    continue
+                validated[name] = value
+            elif value_type == "multi_select":
+                validated[name] = self._validate_multi_select(name, value)
+            else:
+                validated[name] = value
+        return validated
+
+
+_cached_schema: Optional[DatabaseSchema] = None
+
+# スキーマの取得し直しを1つにまとめるロック（asyncio.Lock はイベントループごとに作成する）
+_refresh_locks = weakref.WeakKeyDictionary()
+
+
+def _refresh_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _refresh_locks.get(loop)
+    if lock is None:
+        lock = _refresh_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def get_database_schema(notion, database_id: str, force: bool = False) -> DatabaseSchema:
+    """
+    データベースのスキーマを取得する（NOTION_SCHEMA_REFRESH_SECONDS の間はキャッシュを使う）
+
+    引数:
+        notion: Notion API非同期クライアント
+        database_id: データベースID
+        force: キャッシュを使わずに取得し直すかどうか
+
+    複数のワーカーが同時に取得し直そうとした場合は、最初の1つだけがAPIを呼び出し、
+    残りはロックを待ってその結果を使う。
+    """
+    global _cached_schema
+    schema = _cached_schema
+    if schema is not None and not force and not schema.is_stale:
+        return schema
+
+    async with _refresh_lock():
+        # ロックを待つ間に他のワーカーが取得し直していればその結果を使う
+        current = _cached_schema
+        if current is not None and current is not schema and not current.is_stale:
+            return current
+        database = await notion_request(notion.databases.retrieve, database_id=database_id, idempotent=True)
+        schema = _cached_schema = DatabaseSchema(database)
+        print(
+            f"Notionデータベースのスキーマを取得しました"
+            f"（プロパティ {len(schema.properties)}件, タグ {len(schema.select_options('タグ'))}件）"
+        )
+    return schema
+
+
+def invalidate_database_schema() -> None:
+    """キャッシュしたスキーマを破棄する（次回の登録時に取得し直す）"""
+    global _cached_schema
+    _cached_schema = None
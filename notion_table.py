@@ -1,27 +1,154 @@
 import os
 import re  # 追加
+import asyncio
+import weakref
 from typing import List, Optional
-from notion_client import Client
+
+import httpx
+from notion_client import AsyncClient
+
+from notion_scheduler import notion_request
+from notion_schema import get_database_schema, invalidate_database_schema
+from markdown_to_notion import BlockBatch, compact_paragraphs, iter_markdown_blocks, iter_block_batches, payload_size
+from url_index import registered_url_index
+from upload_checkpoint import upload_checkpoints, content_hash
+from metrics import STAGE_DURATION, NOTION_BATCH_FILL, status_of
+from tracing import span
 
 # タグ予測機能のインポート
-from tag_predictor import load_tags_from_file, predict_tags
+from tag_predictor import predict_content_tags_async
 
 # Notion API設定
 NOTION_TOKEN = os.environ.get("NOTION_TOKEN")
 NOTION_DATABASE_ID = os.environ.get("NOTION_DATABASE_ID", "bb656c8f12024b45afae5bb2ad03578d")
 
 
-def init_notion_client():
-    """Notion APIクライアントを初期化"""
+# 共有クライアントのHTTPコネクションプール設定
+NOTION_MAX_CONNECTIONS = int(os.environ.get("NOTION_MAX_CONNECTIONS", "10"))
+NOTION_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("NOTION_MAX_KEEPALIVE_CONNECTIONS", "5"))
+NOTION_KEEPALIVE_EXPIRY = float(os.environ.get("NOTION_KEEPALIVE_EXPIRY", "60"))
+NOTION_TIMEOUT_MS = int(os.environ.get("NOTION_TIMEOUT_MS", "60000"))
+
+# 連続する短い段落を1つのブロックにまとめてから送信するか（ブロック数・追加リクエスト数が減る）
+NOTION_COMPACT_PARAGRAPHS = os.environ.get("NOTION_COMPACT_PARAGRAPHS", "0") not in ("0", "false", "False")
+
+# プロセス全体で共有するクライアント（イベントループごとに1つ）
+_shared_async_clients = weakref.WeakKeyDictionary()
+
+
+def _notion_pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=NOTION_MAX_CONNECTIONS,
+        max_keepalive_connections=NOTION_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=NOTION_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_notion_async_client() -> AsyncClient:
+    """
+    実行中のイベントループで共有するNotion API非同期クライアントを取得する
+
+    httpx.AsyncClient はイベントループをまたいで使えないため、ループごとに1つ作成する。
+    呼び出し側で close しないこと（終了時は close_notion_clients を呼ぶ）。
+    """
     if not NOTION_TOKEN:
         raise ValueError("NOTION_TOKENが設定されていません。環境変数を確認してください。")
 
-    return Client(auth=NOTION_TOKEN)
+    loop = asyncio.get_running_loop()
+    client = _shared_async_clients.get(loop)
+    if client is None:
+        client = _shared_async_clients[loop] = AsyncClient(
+            auth=NOTION_TOKEN,
+            timeout_ms=NOTION_TIMEOUT_MS,
+            client=httpx.AsyncClient(limits=_notion_pool_limits()),
+        )
+    return client
 
 
-def register_notion_table(content: str, url: str, title: str, tags: Optional[List[str]] = None):
+async def close_notion_clients() -> None:
+    """実行中のイベントループで共有しているNotion APIクライアントを閉じる"""
+    client = _shared_async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _build_page_properties(title: str, url: str, tags: Optional[List[str]]) -> dict:
+    """ページ作成用のプロパティを生成"""
+    properties = {
+        "タイトル": {
+            "title": [
+                {
+                    "text": {
+                        "content": title
+                    }
+                }
+            ]
+        },
+        "URL": {
+            "url": url
+        }
+    }
+
+    # タグがある場合は追加
+    if tags:
+        properties["タグ"] = {
+            "multi_select": [{"name": tag} for tag in tags]
+        }
+
+    return properties
+
+
+def _intro_blocks() -> List[dict]:
+    """コンテンツ先頭に付ける導入文と区切り線のブロック"""
+    return [
+        {
+            "object": "block",
+            "type": "paragraph",
+            "paragraph": {
+                "rich_text": [
+                    {
+                        "type": "text",
+                        "text": {
+                            "content": "以下、抽出したコンテンツ："
+                        }
+                    }
+                ]
+            }
+        },
+        {
+            "object": "block",
+            "type": "divider",
+            "divider": {}
+        }
+    ]
+
+
+async def _validated_properties(notion, properties: dict) -> dict:
+    """キャッシュしたスキーマでプロパティを検証する（スキーマを取得できない場合はそのまま送る）"""
+    try:
+        schema = await get_database_schema(notion, NOTION_DATABASE_ID)
+    except Exception as e:
+        print(f"Notionデータベースのスキーマを取得できないため、検証せずに送信します: {e}")
+        return properties
+    return schema.validate_properties(properties)
+
+
+def _report_batch(label: str, batch: BlockBatch) -> None:
+    """バッチがブロック数・バイト数の上限に対してどれだけ埋まっていたかを記録する"""
+    NOTION_BATCH_FILL.observe(batch.block_fill, limit="blocks")
+    NOTION_BATCH_FILL.observe(batch.byte_fill, limit="bytes")
+    print(
+        f"{label}: {len(batch.blocks)}/{batch.max_blocks} ブロック ({batch.block_fill:.0%}), "
+        f"{batch.size_bytes / 1000:.1f}/{batch.max_bytes / 1000:.0f} KB ({batch.byte_fill:.0%})"
+    )
+
+
+async def register_notion_table_async(content: str, url: str, title: str, tags: Optional[List[str]] = None):
     """
-    マークダウンコンテンツをNotionのテーブルに登録する
+    マークダウンコンテンツをNotionのテーブルに登録する（非同期版）
+
+    進捗は upload_checkpoints に記録し、同じURL・同じ内容で再度呼び出された場合は
+    途中まで作成したページに続きのブロックを追加する。
 
     引数:
         content: マークダウンコンテンツ
@@ -35,406 +162,165 @@ def register_notion_table(content: str, url: str, title: str, tags: Optional[Lis
     if not NOTION_DATABASE_ID:
         raise ValueError("NOTION_DATABASE_IDが設定されていません。環境変数を確認してください。")
 
-    # クライアント初期化
-    notion = init_notion_client()
-
     # タグが指定されていない場合は自動予測
     if tags is None:
-        # 利用可能なタグをファイルから読み込み
-        available_tags = load_tags_from_file()
-
-        if available_tags:
-            # コンテンツからタグを予測
-            tags = predict_tags(content, title, available_tags)
-            print(f"予測されたタグ: {tags}")
-        else:
-            tags = []
-            print("タグのリストが読み込めなかったため、タグなしで登録します。")
+        tags = await predict_content_tags_async(content, title)
 
     # タイトルから改行を除去
     title = re.sub(r'[\r\n]+', ' ', title).strip()
 
-    # まずページ基本情報を作成する
-    try:
-        # プロパティの設定
-        properties = {
-            "タイトル": {
-                "title": [
-                    {
-                        "text": {
-                            "content": title
-                        }
-                    }
-                ]
-            },
-            "URL": {
-                "url": url
-            }
-        }
-
-        # タグがある場合は追加
-        if tags:
-            properties["タグ"] = {
-                "multi_select": [{"name": tag} for tag in tags]
-            }
+    # 共有クライアント（ページ作成と各バッチの追加で同じ接続を使い回す）
+    notion = get_notion_async_client()
+
+    # 前回途中で失敗した登録があれば、作成済みのページに未送信のバッチから追加を再開する
+    # （バッチの分け方は内容が同じなら毎回同じになる）
+    new_page = None
+    resume_from = 0
+    checkpoint = upload_checkpoints.get(url)
+    if checkpoint and checkpoint["page_id"] and checkpoint["content_hash"] == content_hash(title, tags, content):
+        new_page = checkpoint["page"]
+        resume_from = checkpoint["next_batch"]
+        print(f"途中まで登録したページの続きから再開します: {title}（バッチ {resume_from} から）")
+    else:
+        if checkpoint and checkpoint["page_id"]:
+            print(f"登録内容が変わったため新しいページを作成します（途中まで作成したページ: {checkpoint['page_id']}）")
+        upload_checkpoints.start(url, title, tags, content)
 
-        # ページプロパティのみでページを作成
-        new_page = notion.pages.create(
-            **{
-                "parent": {
-                    "type": "database_id",
-                    "database_id": NOTION_DATABASE_ID
-                },
-                "properties": properties
-            }
+    try:
+        properties = _build_page_properties(title, url, tags)
+
+        # 導入文とコンテンツの先頭部分を子ブロックとしてページと同時に作成する
+        # （短い記事はこの1リクエストで登録が完了する）
+        intro = _intro_blocks()
+
+        # ブロックはブロック数とバイト数の上限まで詰めたバッチに分けて送る。
+        # 変換は必要な分だけ進める（先頭のバッチを送信している間、残りは未変換のまま）
+        blocks = iter_markdown_blocks(content)
+        if NOTION_COMPACT_PARAGRAPHS:
+            blocks = compact_paragraphs(blocks)
+        batches = iter_block_batches(
+            blocks,
+            reserved_blocks=len(intro),
+            reserved_bytes=payload_size(properties) + payload_size(intro),
         )
-
-        page_id = new_page["id"]
-        print(f"Notionページを作成しました: {title}")
-
-        # 次にコンテンツをブロックとして追加
-        # 先頭に導入文を追加
-        notion.blocks.children.append(
-            block_id=page_id,
-            children=[
-                {
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {
-                                    "content": "以下、抽出したコンテンツ："
-                                }
-                            }
-                        ]
+        first = next(batches, None)
+        first_batch = first.blocks if first else []
+
+        if new_page is None:
+            # タグ・プロパティ名・値の長さを送信前にスキーマで確認する（スキーマのずれによる400エラーを避ける）
+            # バッチの分け方が変わらないよう、上の reserved_bytes には補正前のプロパティを使う
+            create_properties = await _validated_properties(notion, properties)
+
+            # レート制限・429のリトライは notion_request（全登録処理で共有）が行う
+            with STAGE_DURATION.time(stage="notion_create"), \
+                    span("notion pages.create", blocks=len(first_batch), bytes=first.size_bytes if first else 0):
+                new_page = await notion_request(
+                    notion.pages.create,
+                    **{
+                        "parent": {
+                            "type": "database_id",
+                            "database_id": NOTION_DATABASE_ID
+                        },
+                        "properties": create_properties,
+                        "children": intro + first_batch
                     }
-                },
-                {
-                    "object": "block",
-                    "type": "divider",
-                    "divider": {}
-                }
-            ]
-        )
+                )
+            upload_checkpoints.page_created(url, new_page)
 
-        # Notionの制限: リッチテキストは2000文字以下
-        MAX_TEXT_LENGTH = 1990
-        MAX_BLOCKS_PER_REQUEST = 90  # 1リクエストあたりの最大ブロック数
-
-        # ---- ブロック生成ヘルパー（リンク対応） ----
-        link_re = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
-
-        def _split_text_to_rich(text: str, link_url: Optional[str] = None):
-            """単一のテキストをMAX_TEXT_LENGTH以下のrich_text配列に分割"""
-            if text == "":
-                return []
-            items = []
-            for i in range(0, len(text), MAX_TEXT_LENGTH):
-                chunk = text[i:i + MAX_TEXT_LENGTH]
-                rt = {"type": "text", "text": {"content": chunk}}
-                if link_url:
-                    rt["text"]["link"] = {"url": link_url}
-                items.append(rt)
-            return items
-
-        def _inline_to_rich(text: str):
-            """
-            段落等のインライン文字列に含まれる [label](url) を rich_text 配列へ変換。
-            それ以外は通常テキストとして保持。
-            """
-            rich_parts = []
-            pos = 0
-            for m in link_re.finditer(text):
-                start, end = m.span()
-                label = m.group(1)
-                url_ = m.group(2)
-                # 直前のプレーンテキスト
-                if start > pos:
-                    rich_parts.extend(_split_text_to_rich(text[pos:start]))
-                # リンク部分
-                rich_parts.extend(_split_text_to_rich(label, link_url=url_))
-                pos = end
-            # 残り
-            if pos < len(text):
-                rich_parts.extend(_split_text_to_rich(text[pos:]))
-            return rich_parts or [{"type": "text", "text": {"content": ""}}]
-
-        def _paragraph_block_rich(rich_text: List[dict]):
-            return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": rich_text}}
-
-        def _heading_block(level: int, text: str):
-            level = max(1, min(level, 3))
-            block_type = f"heading_{level}"
-            return {
-                "object": "block",
-                "type": block_type,
-                block_type: {"rich_text": _inline_to_rich(text), "is_toggleable": False},
-            }
+            print(f"Notionページを作成しました: {title}")
+            if first:
+                _report_batch("ページ作成時のブロック", first)
 
-        def _bulleted_item_block_rich(rich_text: List[dict]):
-            return {"object": "block", "type": "bulleted_list_item", "bulleted_list_item": {"rich_text": rich_text}}
-
-        def _numbered_item_block_rich(rich_text: List[dict]):
-            return {"object": "block", "type": "numbered_list_item", "numbered_list_item": {"rich_text": rich_text}}
-
-        def _quote_block_rich(rich_text: List[dict]):
-            return {"object": "block", "type": "quote", "quote": {"rich_text": rich_text}}
-
-        def _todo_block_rich(rich_text: List[dict], checked: bool):
-            return {"object": "block", "type": "to_do", "to_do": {"rich_text": rich_text, "checked": checked}}
-
-        def _code_block(text: str, lang_hint: str):
-            # Notionがサポートする言語のリスト
-            notion_supported_languages = {
-                "abap", "abc", "agda", "arduino", "ascii art", "assembly", "bash", "basic", "bnf",
-                "c", "c#", "c++", "clojure", "coffeescript", "coq", "css", "dart", "dhall", "diff",
-                "docker", "ebnf", "elixir", "elm", "erlang", "f#", "flow", "fortran", "gherkin",
-                "glsl", "go", "graphql", "groovy", "haskell", "hcl", "html", "idris", "java",
-                "javascript", "json", "julia", "kotlin", "latex", "less", "lisp", "livescript",
-                "llvm ir", "lua", "makefile", "markdown", "markup", "matlab", "mathematica",
-                "mermaid", "nix", "notion formula", "objective-c", "ocaml", "pascal", "perl",
-                "php", "plain text", "powershell", "prolog", "protobuf", "purescript", "python",
-                "r", "racket", "reason", "ruby", "rust", "sass", "scala", "scheme", "scss",
-                "shell", "smalltalk", "solidity", "sql", "swift", "toml", "typescript", "vb.net",
-                "verilog", "vhdl", "visual basic", "webassembly", "xml", "yaml", "java/c/c++/c#"
-            }
+        page_id = new_page["id"]
 
-            # 言語ヒントをクリーンアップ（スペースやハイフン以降を削除）
-            lang = (lang_hint or "").strip().lower()
-            # "bash code-line" のような複合的な文字列から最初の単語だけを取得
-            lang = lang.split()[0] if lang else "plain text"
-            lang = lang.split("-")[0] if "-" in lang else lang
-
-            # よく使われる言語のエイリアスマッピング
-            mapping = {
-                "sh": "shell",
-                "bash": "shell",
-                "zsh": "shell",
-                "js": "javascript",
-                "ts": "typescript",
-                "py": "python",
-                "cpp": "c++",
-                "csharp": "c#",
-                "objc": "objective-c",
-                "text": "plain text",
-                "txt": "plain text",
-                "md": "markdown",
-                "yml": "yaml",
-            }
-
-            # マッピングを適用
-            lang = mapping.get(lang, lang)
-
-            # Notionがサポートする言語でない場合は "plain text" を使用
-            if lang not in notion_supported_languages:
-                lang = "plain text"
-
-            return {"object": "block", "type": "code",
-                    "code": {"rich_text": _split_text_to_rich(text), "language": lang}}
-
-        def _add_inline_as_blocks(text: str, make_block_rich):
-            """
-            インライン要素（リンク含む）をMAX_TEXT_LENGTHごとの塊で分割し、ブロック配列に。
-            make_block_rich(rich_text) を用いて種類別のブロックを生成。
-            """
-            segs = _inline_to_rich(text)  # ここで各segmentはMAX_TEXT_LENGTH以下
-            blocks_local = []
-            cur: List[dict] = []
-            cur_len = 0
-            for seg in segs:
-                seg_len = len(seg["text"]["content"])
-                if cur_len + seg_len > MAX_TEXT_LENGTH and cur:
-                    blocks_local.append(make_block_rich(cur))
-                    cur = []
-                    cur_len = 0
-                cur.append(seg)
-                cur_len += seg_len
-            if cur:
-                blocks_local.append(make_block_rich(cur))
-            return blocks_local
-
-        def _add_long_text_as_blocks(text: str, make_block_str):
-            """プレーンテキスト（主にコード/見出しの分割用）をMAX_TEXT_LENGTHごとに分割"""
-            if not text:
-                return []
-            if len(text) <= MAX_TEXT_LENGTH:
-                return [make_block_str(text)]
-            out = []
-            for i in range(0, len(text), MAX_TEXT_LENGTH):
-                out.append(make_block_str(text[i:i + MAX_TEXT_LENGTH]))
-            return out
-
-        blocks: List[dict] = []
-
-        # ---- 簡易Markdownパーサ ----
-        lines = content.splitlines()
-        in_code = False
-        code_lang = ""
-        code_buf: List[str] = []
-
-        para_buf: List[str] = []
-
-        heading_re = re.compile(r"^(#{1,3})\s+(.*)$")
-        bullet_re = re.compile(r"^[-*+]\s+(.*)$")
-        numbered_re = re.compile(r"^\d+\.\s+(.*)$")
-        todo_bullet_re = re.compile(r"^[-*+]\s+\[( |x|X)\]\s+(.*)$")
-        todo_numbered_re = re.compile(r"^\d+\.\s+\[( |x|X)\]\s+(.*)$")
-        quote_re = re.compile(r"^>\s?(.*)$")
-        image_re = re.compile(r"^!\[([^\]]*)\]\((https?://[^\s)]+)\)\s*$")
-
-        def _image_block(img_url: str, caption: str = ""):
-            """Notion画像ブロックを生成"""
-            block = {
-                "object": "block",
-                "type": "image",
-                "image": {
-                    "type": "external",
-                    "external": {
-                        "url": img_url
-                    }
-                }
-            }
-            if caption:
-                block["image"]["caption"] = [
-                    {
-                        "type": "text",
-                        "text": {
-                            "content": caption[:MAX_TEXT_LENGTH]
-                        }
-                    }
-                ]
-            return block
-
-        def flush_paragraph():
-            nonlocal para_buf
-            text = "\n".join(para_buf).strip()
-            para_buf = []
-            if not text:
-                return
-            blocks.extend(_add_inline_as_blocks(text, _paragraph_block_rich))
-
-        def flush_code():
-            nonlocal code_buf, code_lang
-            code_text = "\n".join(code_buf)
-            code_buf = []
-            if code_text == "":
-                return
-            blocks.extend(_add_long_text_as_blocks(code_text, lambda t: _code_block(t, code_lang)))
-
-        for raw in lines + [""]:  # 最後にフラッシュ用の空行を追加
-            line = raw.rstrip("\n")
-
-            # コードフェンス開始/終了
-            if line.strip().startswith("```"):
-                fence = line.strip()
-                if not in_code:
-                    # 開始：先に現在の段落をフラッシュ
-                    flush_paragraph()
-                    in_code = True
-                    code_lang = fence[3:].strip()  # ```lang
-                    code_buf = []
-                else:
-                    # 終了
-                    in_code = False
-                    flush_code()
-                    code_lang = ""
-                continue
-
-            if in_code:
-                code_buf.append(line)
-                continue
-
-            # 空行はセクション区切り（段落フラッシュ）
-            if line.strip() == "":
-                flush_paragraph()
-                continue
-
-            # 見出し
-            m_h = heading_re.match(line.strip())
-            if m_h:
-                flush_paragraph()
-                level = len(m_h.group(1))
-                heading_text = m_h.group(2).strip()
-                if heading_text:
-                    if len(heading_text) <= MAX_TEXT_LENGTH:
-                        blocks.append(_heading_block(level, heading_text))
-                    else:
-                        blocks.append(_heading_block(level, heading_text[:MAX_TEXT_LENGTH]))
-                        rest = heading_text[MAX_TEXT_LENGTH:]
-                        blocks.extend(_add_inline_as_blocks(rest, _paragraph_block_rich))
-                continue
-
-            # 引用
-            m_q = quote_re.match(line)
-            if m_q:
-                flush_paragraph()
-                q_text = m_q.group(1).strip()
-                blocks.extend(_add_inline_as_blocks(q_text, _quote_block_rich))
-                continue
-
-            # チェックボックス（to_do）
-            m_tb = todo_bullet_re.match(line)
-            m_tn = todo_numbered_re.match(line)
-            if m_tb or m_tn:
-                flush_paragraph()
-                checked = (m_tb.group(1) if m_tb else m_tn.group(1)).lower() == "x"
-                t_text = (m_tb.group(2) if m_tb else m_tn.group(2)).strip()
-                # 文字数オーバー時は複数のto_doに分割（checkedは維持）
-                seg_blocks = _add_inline_as_blocks(t_text, lambda rich: _todo_block_rich(rich, checked))
-                blocks.extend(seg_blocks)
-                continue
-
-            # 箇条書き（通常）
-            m_b = bullet_re.match(line)
-            if m_b:
-                flush_paragraph()
-                item_text = m_b.group(1).strip()
-                blocks.extend(_add_inline_as_blocks(item_text, _bulleted_item_block_rich))
-                continue
-
-            # 番号付き
-            m_n = numbered_re.match(line)
-            if m_n:
-                flush_paragraph()
-                item_text = m_n.group(1).strip()
-                blocks.extend(_add_inline_as_blocks(item_text, _numbered_item_block_rich))
-                continue
-
-            # 画像
-            m_img = image_re.match(line.strip())
-            if m_img:
-                flush_paragraph()
-                alt_text = m_img.group(1)
-                img_url = m_img.group(2)
-                blocks.append(_image_block(img_url, alt_text))
-                continue
-
-            # それ以外は通常段落の一部としてバッファ
-            para_buf.append(line)
-
-        # 念のため最後の残りをフラッシュ
-        if in_code:
-            flush_code()
-        flush_paragraph()
-
-        # ブロックを適切なサイズのバッチに分割して追加
-        for i in range(0, len(blocks), MAX_BLOCKS_PER_REQUEST):
-            batch = blocks[i:i + MAX_BLOCKS_PER_REQUEST]
-            notion.blocks.children.append(
-                block_id=page_id,
-                children=batch
-            )
-            print(
-                f"ブロックバッチを追加しました: {i // MAX_BLOCKS_PER_REQUEST + 1}/{(len(blocks) - 1) // MAX_BLOCKS_PER_REQUEST + 1}")
+        # 残りのブロックをバッチごとに追加
+        for batch_number, batch in enumerate(batches, start=1):
+            if batch_number < resume_from:
+                continue  # 前回送信済み
+            with STAGE_DURATION.time(stage="notion_append"), \
+                    span("notion blocks.children.append", batch=batch_number, blocks=len(batch.blocks), bytes=batch.size_bytes):
+                await notion_request(
+                    notion.blocks.children.append,
+                    block_id=page_id,
+                    children=batch.blocks
+                )
+            upload_checkpoints.batch_done(url, batch_number)
+            _report_batch(f"ブロックバッチ {batch_number} を追加しました", batch)
+
+        # 登録済みURLのインデックスを更新（同じURLの再登録を取得前に弾けるように）
+        registered_url_index.add(url)
+        upload_checkpoints.delete(url)
 
         return new_page
     except Exception as e:
+        if status_of(e) == 400:
+            # スキーマが変わった可能性があるため、次回の登録時に取得し直す
+            invalidate_database_schema()
+        if resume_from and status_of(e) == 404:
+            # 途中まで作成したページが削除されている場合は、次回は最初から登録し直す
+            upload_checkpoints.delete(url)
         print(f"Notionページの作成に失敗しました: {e}")
         raise
 
 
+async def load_registered_urls_async() -> List[str]:
+    """
+    Notionデータベースに登録済みのページのURLプロパティをすべて取得する
+
+    戻り値:
+        List[str]: 登録済みのURLのリスト
+    """
+    if not NOTION_DATABASE_ID:
+        raise ValueError("NOTION_DATABASE_IDが設定されていません。環境変数を確認してください。")
+
+    urls = []
+    notion = get_notion_async_client()
+    start_cursor = None
+    while True:
+        query = {"database_id": NOTION_DATABASE_ID, "page_size": 100}
+        if start_cursor:
+            query["start_cursor"] = start_cursor
+        response = await notion_request(notion.databases.query, idempotent=True, **query)
+
+        for page in response.get("results", []):
+            url_prop = page.get("properties", {}).get("URL", {})
+            if url_prop.get("url"):
+                urls.append(url_prop["url"])
+
+        if not response.get("has_more"):
+            break
+        start_cursor = response.get("next_cursor")
+    return urls
+
+
+async def seed_registered_url_index_async() -> int:
+    """
+    登録済みURLのインデックスをNotionデータベースから初期化する（起動時に1回呼び出す）
+
+    戻り値:
+        int: インデックスの件数
+    """
+    urls = await load_registered_urls_async()
+    count = registered_url_index.seed(urls)
+    print(f"登録済みURLのインデックスを読み込みました: {count}件")
+    return count
+
+
+def register_notion_table(content: str, url: str, title: str, tags: Optional[List[str]] = None):
+    """
+    マークダウンコンテンツをNotionのテーブルに登録する（同期版。スクリプト・テスト用）
+
+    引数・戻り値は register_notion_table_async と同じ
+    """
+    async def _run():
+        try:
+            return await register_notion_table_async(content, url=url, title=title, tags=tags)
+        finally:
+            await close_notion_clients()
+
+    return asyncio.run(_run())
+
+
 if __name__ == "__main__":
     # テスト用
     with open("downloaded/output.md", "r", encoding="utf-8") as f:
@@ -0,0 +1,99 @@
+import time
+import asyncio
+from typing import Optional
+
+from ttl_store import TTLStore
+
+
+class _MessageState:
+    """1つの進捗メッセージの送信状態"""
+
+    def __init__(self):
+        self.latest: Optional[str] = None  # 最新の表示内容
+        self.sent: Optional[str] = None    # 最後に実際に編集した内容
+        self.last_edit = 0.0
+        self.flush_task: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+
+class ProgressMessageEditor:
+    """
+    1つのメッセージを編集し続けて進捗を表示するためのヘルパー
+
+    同じメッセージへの更新が window_seconds 以内に続いた場合は、途中の内容を捨てて
+    最新の内容だけを window_seconds 経過後にまとめて1回編集する（Discordのレート制限対策）。
+    final=True の更新（完了・エラー）は待たずにすぐ編集する。
+
+    メッセージごとの状態は final=True の更新か forget で破棄する。どちらも呼ばれなかった場合に
+    備えて、state_ttl_seconds の間更新がない状態と max_states を超えた古い状態は自動で削除する。
+    """
+
+    def __init__(self, window_seconds: float = 2.0, state_ttl_seconds: float = 3600, max_states: int = 1000):
+        self.window_seconds = window_seconds
+        self._states = TTLStore(ttl_seconds=state_ttl_seconds, max_entries=max_states)
+
+        # 統計情報
+        self.edits = 0
+        self.coalesced = 0
+
+    async def update(self, message, content: str, final: bool = False) -> None:
+        """
+        進捗メッセージの内容を更新する
+
+        引数:
+            message: 編集対象のメッセージ（discord.Message / PartialMessage など edit(content=...) を持つもの）
+            content: 新しい表示内容
+            final: 最後の更新かどうか（True の場合は即座に編集し、状態を破棄する）
+        """
+        # 更新のたびに有効期限を延長する
+        state = self._states.update(message.id, lambda current: current or _MessageState())
+        if state.latest is not None and state.latest != state.sent:
+            # 未送信の更新を上書きする
+            self.coalesced += 1
+        state.latest = content
+
+        if final:
+            self._states.pop(message.id, None)
+            await self._flush(message, state)
+            return
+
+        if state.flush_task is not None:
+            # 既に遅延編集が予約されているので、その時点の最新内容が送られる
+            return
+
+        wait = state.last_edit + self.window_seconds - time.monotonic()
+        if wait <= 0:
+            await self._flush(message, state)
+        else:
+            state.flush_task = asyncio.get_running_loop().create_task(
+                self._delayed_flush(message, state, wait)
+            )
+
+    def forget(self, message_id: Optional[int]) -> None:
+        """
+        メッセージの状態を破棄する（final=True の更新をせずにジョブが終わった場合に呼び出す）
+
+        予約済みの遅延編集はそのまま実行され、最後の内容が表示される。
+        """
+        if message_id is not None:
+            self._states.pop(message_id)
+
+    async def _delayed_flush(self, message, state: _MessageState, wait: float) -> None:
+        await asyncio.sleep(wait)
+        state.flush_task = None
+        await self._flush(message, state)
+
+    async def _flush(self, message, state: _MessageState) -> None:
+        """最新の内容でメッセージを編集する（既に同じ内容を送信済みなら何もしない）"""
+        async with state.lock:
+            content = state.latest
+            if content is None or content == state.sent:
+                return
+            try:
+                await message.edit(content=content)
+                self.edits += 1
+            except Exception as e:
+                print(f"進捗メッセージの編集中にエラーが発生: {e}")
+            # 失敗時も同じ内容での再試行はしない（次の更新で上書きされる）
+            state.sent = content
+            state.last_edit = time.monotonic()
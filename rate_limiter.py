@@ -0,0 +1,116 @@
+import time
+import random
+import asyncio
+import threading
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレート制限（スレッドセーフ・イベントループ非依存）
+
+    rate 個/秒でトークンが補充され、最大 capacity 個まで貯まる（= 瞬間的に許可するバースト数）。
+    トークンが足りない場合は「予約」として残高をマイナスにし、補充されるまでの時間だけ待機する。
+    そのため呼び出し順に待ち時間が積み上がり、同時に大量のリクエストが来ても rate を超えない。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()  # 一時停止中は再開時刻（未来の時刻）になる
+        self._lock = threading.Lock()
+
+        # 統計情報
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.pauses = 0
+
+    def _refill_locked(self, now: float) -> None:
+        """経過時間分のトークンを補充する（ロック取得済みで呼ぶ。一時停止中は補充しない）"""
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """
+        トークンを1つ予約する
+
+        戻り値:
+            float: 予約したトークンが使えるようになるまでの待ち時間（秒）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            self._tokens -= 1
+            wait = (self._updated - now) + max(0.0, -self._tokens / self.rate)
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+            return wait
+
+    async def acquire_async(self) -> None:
+        """トークンを1つ取得する（asyncio版）"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        指定秒数のあいだ新しいトークンを払い出さない（Retry-After を全リクエストで共有するため）
+
+        一時停止中に補充されるはずだった分も捨て、再開時点で払い出せるのは1つだけにする
+        （再開直後に貯まったバーストが一気に流れて再び制限されないように）。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            until = now + max(0.0, seconds)
+            if until > self._updated:
+                self._tokens = min(self._tokens, 1.0)
+                self._updated = until
+                self.pauses += 1
+
+    def stats(self) -> dict:
+        """
+        現在の状態と統計情報を返す
+
+        tokens は現時点で払い出せるトークン数（マイナスの場合は予約済みで待機中のリクエストがある）、
+        paused_seconds は pause による一時停止の残り秒数。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            return {
+                "rate": self.rate,
+                "capacity": self.capacity,
+                "tokens": self._tokens,
+                "paused_seconds": max(0.0, self._updated - now),
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "wait_seconds": self.wait_seconds,
+                "pauses": self.pauses,
+            }
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """
+    リトライの待ち時間（指数バックオフ + フルジッター）
+
+    引数:
+        attempt: 何回目のリトライか（0始まり）
+        base: 初回の待ち時間の上限（秒）
+        cap: 待ち時間の上限（秒）
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After ヘッダー（秒数）を解釈する（解釈できない場合は 0）"""
+    if value is None:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,391 @@
+import os
+import re
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+from stage_pipeline import PipelineStage, StagePipeline
+from ttl_store import TTLStore
+from metrics import STAGE_DURATION, register_counter, register_gauge
+from tracing import Trace, span
+from get_site import fetch_and_convert_to_markdown_async
+from get_x_post import fetch_x_post_async
+from get_x_article import fetch_x_article, is_x_article_url
+from notion_table import register_notion_table_async
+from url_index import registered_url_index
+from upload_checkpoint import upload_checkpoints
+from title_translator import is_non_japanese_title, translate_title_async
+from tag_predictor import predict_content_tags_async
+
+# URL登録タスクの処理（取得 → 補完（翻訳・タグ） → 書き込み）
+# Discord Bot（discord_bot.py）と一括登録のCLI（bulk_import.py）で共有する。
+# 進捗・結果の通知先は set_notifier で差し替える（既定では標準出力に表示）。
+
+# 同一メッセージ内のXポスト重複防止情報の保持期間（秒）と最大メッセージ数
+X_DEDUPE_TTL_SECONDS = int(os.environ.get("X_DEDUPE_TTL_SECONDS", "3600"))
+X_DEDUPE_MAX_MESSAGES = int(os.environ.get("X_DEDUPE_MAX_MESSAGES", "1000"))
+
+# ジョブの処理結果（job['status']）
+STATUS_REGISTERED = "registered"  # Notionに登録した
+STATUS_SKIPPED = "skipped"        # 登録済み・対象外のため登録しなかった
+STATUS_FAILED = "failed"          # エラーで登録できなかった
+
+# YouTube URLの判定関数
+def is_youtube_url(url: str) -> bool:
+    """YouTube URLかどうかを判定"""
+    youtube_domains = [
+        'youtube.com',
+        'youtu.be',
+        'www.youtube.com',
+        'm.youtube.com'
+    ]
+    return any(domain in url.lower() for domain in youtube_domains)
+
+# X/Twitter URLの判定関数
+def is_x_url(url: str) -> bool:
+    """X/Twitter URLかどうかを判定"""
+    from urllib.parse import urlparse
+    try:
+        parsed = urlparse(url)
+        hostname = parsed.hostname or ''
+        x_domains = ['x.com', 'twitter.com', 'www.x.com', 'www.twitter.com', 'mobile.twitter.com']
+        return hostname in x_domains
+    except Exception:
+        return False
+
+# 同一メッセージ内で既に取得済みのXポストIDを追跡（重複登録防止）
+# key: message_id, value: frozenset of post IDs
+# 長期間稼働してもメモリが増え続けないよう、有効期限と最大件数で古いメッセージ分を削除する
+_message_processed_x_ids = TTLStore(ttl_seconds=X_DEDUPE_TTL_SECONDS, max_entries=X_DEDUPE_MAX_MESSAGES)
+
+# /metrics で公開するメトリクス（重複防止ストアの件数とヒット・ミス・削除の件数）
+register_gauge(
+    "x_dedupe_store_entries",
+    "Messages tracked by the per-message X post dedupe store.",
+    lambda: len(_message_processed_x_ids),
+)
+register_counter(
+    "x_dedupe_store_lookups_total",
+    "Lookups in the per-message X post dedupe store, by result.",
+    lambda: [
+        ({"result": "hit"}, _message_processed_x_ids.hits),
+        ({"result": "miss"}, _message_processed_x_ids.misses),
+    ],
+    ("result",),
+)
+register_counter(
+    "x_dedupe_store_removed_total",
+    "Messages removed from the per-message X post dedupe store, by reason.",
+    lambda: [
+        ({"reason": "expired"}, _message_processed_x_ids.expired),
+        ({"reason": "evicted"}, _message_processed_x_ids.evicted),
+    ],
+    ("reason",),
+)
+
+
+async def _print_notifier(task, message, final=False):
+    """既定の通知先（標準出力に表示する）"""
+    url = task.get('url', '')
+    if url and url not in message:
+        message = f"[{url}] {message}"
+    print(message)
+
+
+Notifier = Callable[[Dict, str, bool], Awaitable[None]]
+_notifier: Notifier = _print_notifier
+
+
+def set_notifier(notifier: Notifier) -> None:
+    """
+    進捗・結果の通知先を設定する
+
+    引数:
+        notifier: notifier(task, message, final) を受け取る非同期関数
+                  final は完了・スキップ・エラーなど最後の通知かどうか
+    """
+    global _notifier
+    _notifier = notifier
+
+
+async def notify(task, message, final=False):
+    """タスクの進捗・結果を通知する"""
+    await _notifier(task, message, final)
+
+
+# 例外発生時のエラーメッセージを通知するヘルパー関数
+async def report_task_error(task, e: Exception, hint: str = ""):
+    """例外発生箇所のファイル名と行番号を付けてエラーを通知する（hint があれば末尾に追記）"""
+    try:
+        import traceback
+        tb = traceback.extract_tb(e.__traceback__)
+        if tb:
+            filename, lineno, _, _ = tb[-1]
+            error_message = f"❌ 処理中にエラーが発生しました: {str(e)} (ファイル: {filename}, 行: {lineno})"
+        else:
+            error_message = f"❌ 処理中にエラーが発生しました: {str(e)}"
+    except Exception as _:
+        error_message = f"❌ 処理中にエラーが発生しました: {str(e)}"
+    if hint:
+        error_message += f"\n{hint}"
+    await notify(task, error_message, final=True)
+
+
+# ---- 登録パイプラインの各段 ----
+# 各段は job（タスクと途中結果を保持する辞書）を受け取り、次の段へ渡す job を返す。
+# None を返した場合はその時点で処理を終了する（スキップ・失敗時）。
+# 処理を終えたジョブには job['status'] に結果（STATUS_*）を記録する。
+
+async def fetch_stage(job):
+    """URLのコンテンツを取得する段"""
+    task = job['task']
+    url = task['url']
+
+    try:
+        # 前回途中で失敗した登録は、保存済みのタイトル・タグ・本文を使って書き込みから再開する
+        # （作成済みのページのURLはインデックスに載っていることがあるため、登録済みの判定より先に確認する）
+        checkpoint = upload_checkpoints.get(url)
+        if checkpoint and checkpoint['page_id']:
+            await notify(task, "途中まで登録したページがあります。続きから登録を再開します...")
+            job['resume'] = checkpoint
+            job['title'] = checkpoint['title']
+            job['content'] = checkpoint['content']
+            return job
+
+        # Notionに登録済みのURLは取得やLLM呼び出しの前にスキップする
+        if registered_url_index.contains(url):
+            await notify(task, f"URL `{url}` は既にNotionに登録済みのためスキップします。", final=True)
+            job['status'] = STATUS_SKIPPED
+            return None
+
+        # YouTube URLかどうかチェック
+        if is_youtube_url(url):
+            await notify(task, "YouTube動画を検出しました。記事生成はChrome拡張を使ってください。", final=True)
+            job['status'] = STATUS_SKIPPED
+            return None
+        elif is_x_article_url(url):
+            # X/Twitter記事（Article）の処理
+            await notify(task, "X/Twitterの記事（Article）を取得しています...")
+            # Playwright（sync API）はイベントループを塞がないよう別スレッドで実行
+            with STAGE_DURATION.time(stage="fetch", source="x_article"):
+                title, content = await asyncio.to_thread(fetch_x_article, url)
+        elif is_x_url(url):
+            # 同一メッセージ内で既に取得済みのポストIDかチェック
+            post_id_match = re.search(r'/status/(\d+)', url)
+            msg_id = task.get('message_id')
+            if post_id_match and msg_id:
+                post_id = post_id_match.group(1)
+                if post_id in _message_processed_x_ids.get(msg_id, frozenset()):
+                    await notify(task, f"ポスト `{url}` は引用ツイートとして既に登録済みのためスキップします。", final=True)
+                    job['status'] = STATUS_SKIPPED
+                    return None
+
+            # X/Twitterポストの処理
+            await notify(task, "X/Twitterのポストを取得しています...")
+            with STAGE_DURATION.time(stage="fetch", source="x_post"):
+                title, content, collected_ids = await fetch_x_post_async(url)
+
+            # 取得した全ポストIDを記録（同一メッセージの後続タスクで重複防止）
+            if msg_id and collected_ids:
+                _message_processed_x_ids.update(
+                    msg_id, lambda processed: (processed or frozenset()) | frozenset(collected_ids)
+                )
+        else:
+            # 通常のWebページの処理
+            status_msg = f"サイトのコンテンツを取得しています..."
+            await notify(task, status_msg)
+            # サイトのタイトルとコンテンツを取得
+            with STAGE_DURATION.time(stage="fetch", source="site"):
+                title, content = await fetch_and_convert_to_markdown_async(url)
+
+        if not content:
+            await notify(task, f"❌ コンテンツの取得に失敗しました: {url}", final=True)
+            job['status'] = STATUS_FAILED
+            return None
+    except Exception as e:
+        await report_task_error(task, e)
+        job['status'] = STATUS_FAILED
+        return None
+
+    job['title'] = title
+    job['content'] = content
+    return job
+
+
+async def enrich_stage(job):
+    """タイトル翻訳とタグ予測を行う段"""
+    task = job['task']
+    title = job['title']
+    content = job['content']
+    tags = task.get('tags')  # タグは省略可能
+
+    checkpoint = job.get('resume')
+    if checkpoint:
+        # 再開時は前回の翻訳済みタイトルと予測済みタグをそのまま使う
+        job['original_title'] = title
+        job['translated_title'] = None
+        job['tags'] = checkpoint['tags']
+        return job
+
+    try:
+        # タイトルの翻訳（英語など日本語以外の場合）とタグの自動予測は
+        # 互いに独立したLLM呼び出しなので、両方を同時に開始して並行実行する
+        original_title = title
+        translated_title = None
+
+        translate_job = None
+        if is_non_japanese_title(title):
+            translate_job = asyncio.create_task(translate_title_async(title))
+        tags_job = None
+        if tags is None:
+            tags_job = asyncio.create_task(predict_content_tags_async(content, original_title))
+
+        if translate_job:
+            status_msg = f"タイトルを翻訳しています..."
+            await notify(task, status_msg)
+
+            translated_title = await translate_job
+            if translated_title:
+                title = f"{translated_title} (原題: {original_title})"
+
+        if tags_job:
+            tags = await tags_job
+    except Exception as e:
+        await report_task_error(task, e)
+        job['status'] = STATUS_FAILED
+        return None
+
+    job['title'] = title
+    job['original_title'] = original_title
+    job['translated_title'] = translated_title
+    job['tags'] = tags
+    return job
+
+
+async def write_stage(job):
+    """Notionテーブルに登録して完了を通知する段"""
+    task = job['task']
+    url = task['url']
+    title = job['title']
+    original_title = job['original_title']
+    translated_title = job['translated_title']
+    tags = job['tags']
+
+    try:
+        # 処理状況の更新
+        status_msg = f"Notionテーブルに登録しています..."
+        await notify(task, status_msg)
+
+        # Notionテーブルに登録
+        page = await register_notion_table_async(job['content'], url=url, title=title, tags=tags)
+
+        # 完了メッセージを送信
+        page_url = page.get("url", "不明")
+
+        # タグ情報を取得
+        try:
+            # 登録されたタグの取得を試みる（存在すれば）
+            registered_tags = []
+            if "properties" in page and "タグ" in page["properties"] and "multi_select" in page["properties"]["タグ"]:
+                for tag_obj in page["properties"]["タグ"]["multi_select"]:
+                    if "name" in tag_obj:
+                        registered_tags.append(tag_obj["name"])
+
+            if registered_tags:
+                tag_info = f"タグ: {', '.join(registered_tags)}"
+            else:
+                tag_info = "タグ: なし"
+        except:
+            # エラーが発生した場合はシンプルな情報を表示
+            if tags:
+                tag_info = f"タグ: {', '.join(tags)}"
+            else:
+                tag_info = "タグ: 自動予測（詳細不明）"
+
+        # 翻訳情報を表示用に整形
+        title_info = title
+        if translated_title:  # 翻訳された場合
+            title_info = f"**タイトル:** {translated_title}\n**原題:** {original_title}"
+        else:
+            title_info = f"**タイトル:** {title}"
+
+        message = f"✅ URLの登録が完了しました!\n{title_info}\n**元URL:** {url}\n**Notion URL:** {page_url}\n**{tag_info}**"
+        await notify(task, message, final=True)
+    except Exception as e:
+        hint = ""
+        checkpoint = upload_checkpoints.get(url)
+        if checkpoint and checkpoint['page_id']:
+            hint = "同じURLをもう一度投稿すると、作成済みのページに続きから登録します。"
+        await report_task_error(task, e, hint)
+        job['status'] = STATUS_FAILED
+        return None
+
+    job['page'] = page
+    job['status'] = STATUS_REGISTERED
+    return job
+
+
+def _traced_stage(name, handler):
+    """
+    段の処理をジョブのトレース上のスパンとして記録するようにラップする
+
+    段ごとに別のワーカータスクで実行されるため、トレースはコンテキスト変数ではなく job で持ち回し、
+    各段の開始時に有効化する（段の中の外部API呼び出しのスパンはこのトレースに記録される）。
+    """
+    async def run(job):
+        with job['trace'].activate(), span(f"stage {name}"):
+            return await handler(job)
+    run.__name__ = handler.__name__
+    return run
+
+
+REGISTER_STAGES = (
+    _traced_stage("fetch", fetch_stage),
+    _traced_stage("enrich", enrich_stage),
+    _traced_stage("write", write_stage),
+)
+
+
+def new_job(task, task_id=None):
+    """タスクから登録パイプラインのジョブを作成する"""
+    trace = Trace("register", url=task.get('url', ''), task_id=task_id if task_id is not None else "direct")
+    return {'task_id': task_id, 'task': task, 'trace': trace}
+
+
+def export_trace(job):
+    """ジョブのトレースをJSONファイルに書き出す（失敗しても処理は継続する）"""
+    trace = job.get('trace')
+    if trace is None:
+        return
+    try:
+        path = trace.export()
+        if path:
+            print(f"トレースを書き出しました: {path}（{trace.duration:.1f}秒）")
+    except Exception as e:
+        print(f"トレースの書き出しに失敗しました: {e}")
+
+
+def build_register_pipeline(
+        fetch_workers: int,
+        enrich_workers: int,
+        write_workers: int,
+        queue_size: int,
+        on_complete: Optional[Callable[[Dict], None]] = None
+) -> StagePipeline:
+    """
+    取得 → 補完（翻訳・タグ） → 書き込み の3段パイプラインを作成する
+
+    段の間のキューには上限があり、後段が詰まると前段が自然に待機する。
+    外部APIごとの同時実行数（backend_limits）とNotionのレート制限（notion_scheduler）は
+    プロセス全体で共有されるため、ワーカー数を増やしてもその上限は超えない。
+
+    引数:
+        fetch_workers / enrich_workers / write_workers: 各段のワーカー数
+        queue_size: 各段の入力キューの上限
+        on_complete: パイプラインを抜けたジョブ（完了・スキップ・失敗）を受け取る関数
+    """
+    fetch, enrich, write = REGISTER_STAGES
+    return StagePipeline([
+        PipelineStage("fetch", fetch, fetch_workers, queue_size, on_complete=on_complete),
+        PipelineStage("enrich", enrich, enrich_workers, queue_size, on_complete=on_complete),
+        PipelineStage("write", write, write_workers, queue_size, on_complete=on_complete),
+    ])
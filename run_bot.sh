@@ -2,6 +2,8 @@
 set -euo pipefail
 cd "$(dirname "$0")"
 export PLAYWRIGHT_BROWSERS_PATH=/opt/data/.cache/ms-playwright
+# タスクキュー等の永続データは再デプロイ後も残る場所に置く
+export DATA_DIR="${DATA_DIR:-/opt/data/scraping-notion-register}"
 if [ -f .env ]; then
   set -a
   . ./.env
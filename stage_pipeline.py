@@ -0,0 +1,137 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class PipelineStage:
+    """
+    上限付きキューとワーカーを持つパイプラインの1段
+
+    handler が返した値は次の段のキューに渡される。
+    handler が None を返すか例外を送出した場合、またはこの段が最後の段の場合は、
+    そのジョブはパイプラインから抜けて on_complete が呼ばれる。
+    """
+
+    def __init__(
+            self,
+            name: str,
+            handler: Callable[[Dict], Awaitable[Optional[Dict]]],
+            workers: int,
+            queue_size: int,
+            on_complete: Optional[Callable[[Dict], None]] = None
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.on_complete = on_complete
+        self.next_stage: Optional["PipelineStage"] = None
+
+        # 統計情報
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+
+    async def put(self, job: Dict) -> None:
+        """ジョブをこの段のキューに追加する（キューが満杯の場合は空くまで待機）"""
+        await self.queue.put(job)
+
+    def start(self) -> List[asyncio.Task]:
+        """ワーカーを起動する"""
+        self.started_at = time.monotonic()
+        return [
+            asyncio.get_running_loop().create_task(self._worker(), name=f"{self.name}-worker-{i + 1}")
+            for i in range(self.workers)
+        ]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            self.in_flight += 1
+            started = time.monotonic()
+            result = None
+            try:
+                result = await self.handler(job)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"パイプライン段 {self.name} でエラーが発生しました: {e}")
+            finally:
+                self.busy_seconds += time.monotonic() - started
+                self.queue.task_done()
+
+            # 次の段へ渡し終えるまでは処理中として数える（後段が詰まっている状態が見えるように）
+            try:
+                if result is not None and self.next_stage is not None:
+                    await self.next_stage.put(result)
+                elif self.on_complete is not None:
+                    self.on_complete(result if result is not None else job)
+            except Exception as e:
+                print(f"パイプライン段 {self.name} の完了処理でエラーが発生しました: {e}")
+            finally:
+                self.in_flight -= 1
+
+    def snapshot(self) -> Dict:
+        """キューの深さとスループットなどの統計情報を返す"""
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        finished = self.processed + self.failed
+        return {
+            "name": self.name,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "throughput_per_min": finished / elapsed * 60,
+            "avg_seconds": self.busy_seconds / finished if finished else 0.0,
+        }
+
+
+class StagePipeline:
+    """PipelineStage を順につないだパイプライン"""
+
+    def __init__(self, stages: List[PipelineStage]):
+        if not stages:
+            raise ValueError("パイプラインには少なくとも1つの段が必要です")
+        self.stages = stages
+        for current, following in zip(stages, stages[1:]):
+            current.next_stage = following
+
+    async def put(self, job: Dict) -> None:
+        """先頭の段にジョブを追加する"""
+        await self.stages[0].put(job)
+
+    def start(self) -> List[asyncio.Task]:
+        """全段のワーカーを起動する"""
+        tasks = []
+        for stage in self.stages:
+            tasks.extend(stage.start())
+        return tasks
+
+    def snapshot(self) -> List[Dict]:
+        return [stage.snapshot() for stage in self.stages]
+
+    def format_stats(self) -> str:
+        """各段の統計情報を1行ずつの文字列に整形する（ボトルネックの確認用）"""
+        lines = []
+        for s in self.snapshot():
+            lines.append(
+                f"[{s['name']}] キュー: {s['queue_depth']}/{s['queue_size']}, "
+                f"処理中: {s['in_flight']}/{s['workers']}, "
+                f"完了: {s['processed']}, 失敗: {s['failed']}, "
+                f"スループット: {s['throughput_per_min']:.1f}件/分, 平均: {s['avg_seconds']:.1f}秒"
+            )
+        return "\n".join(lines)
+
+    def is_idle(self) -> bool:
+        return all(stage.queue.empty() and stage.in_flight == 0 for stage in self.stages)
+
+    async def report_stats(self, interval: float = 60) -> None:
+        """処理中のジョブがある間、各段の統計情報を定期的にログ出力する"""
+        while True:
+            await asyncio.sleep(interval)
+            if not self.is_idle():
+                print(f"登録パイプラインの状況:\n{self.format_stats()}")
@@ -1,7 +1,12 @@
 import os
+import asyncio
 from typing import List
 
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from backend_limits import async_backend_slot
+from metrics import STAGE_DURATION, record_api_error, record_llm_usage, status_of
+from tracing import span
 
 # Gemini API設定（OpenAI互換エンドポイント経由で利用）
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
@@ -27,9 +32,9 @@ def load_tags_from_file(file_path: str = "tags.txt") -> List[str]:
         return []
 
 
-def predict_tags(content: str, title: str, available_tags: List[str], max_tags: int = 5) -> List[str]:
+async def predict_tags_async(content: str, title: str, available_tags: List[str], max_tags: int = 5) -> List[str]:
     """
-    OpenAI APIを使用してコンテンツからタグを予測
+    OpenAI APIを使用してコンテンツからタグを予測（非同期版）
     
     引数:
         content: 分析するコンテンツ（マークダウン形式）
@@ -48,9 +53,6 @@ def predict_tags(content: str, title: str, available_tags: List[str], max_tags:
         print("警告: 使用可能なタグが見つかりません。タグ予測はスキップします。")
         return []
 
-    # クライアントの初期化
-    client = OpenAI(api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL)
-    
     # コンテンツの最初の部分だけを使用（APIの文字数制限のため）
     trimmed_content = content[:3000] if len(content) > 3000 else content
     
@@ -59,15 +61,19 @@ def predict_tags(content: str, title: str, available_tags: List[str], max_tags:
         tags_str = ", ".join(available_tags)
         
         # Gemini 3.5 Flash（ナレッジカットオフ2026年1月）を呼び出し
-        response = client.chat.completions.create(
-            model="gemini-3.5-flash",
-            messages=[
-                {"role": "system", "content": f"あなたはコンテンツに適したタグを選択する専門家です。以下のタグリストからコンテンツに最も関連するタグを選んでください: {tags_str}"},
-                {"role": "user", "content": f"タイトル: {title}\n\nコンテンツ: {trimmed_content}\n\nこのコンテンツに最適なタグを{max_tags}個以内で選んでください。タグはカンマ区切りのリストとして返してください。提示されたタグリスト以外のタグは使用しないでください。"}
-            ],
-            reasoning_effort="none",
-            max_completion_tokens=500
-        )
+        # クライアントの初期化
+        async with AsyncOpenAI(api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL) as client, async_backend_slot("gemini"):
+            with STAGE_DURATION.time(stage="tag"), span("gemini tag"):
+                response = await client.chat.completions.create(
+                    model="gemini-3.5-flash",
+                    messages=[
+                        {"role": "system", "content": f"あなたはコンテンツに適したタグを選択する専門家です。以下のタグリストからコンテンツに最も関連するタグを選んでください: {tags_str}"},
+                        {"role": "user", "content": f"タイトル: {title}\n\nコンテンツ: {trimmed_content}\n\nこのコンテンツに最適なタグを{max_tags}個以内で選んでください。タグはカンマ区切りのリストとして返してください。提示されたタグリスト以外のタグは使用しないでください。"}
+                    ],
+                    reasoning_effort="none",
+                    max_completion_tokens=500
+                )
+        record_llm_usage("gemini-3.5-flash", getattr(response, "usage", None))
         
         # レスポンスからタグを抽出
         tags_text = response.choices[0].message.content.strip()
@@ -82,10 +88,42 @@ def predict_tags(content: str, title: str, available_tags: List[str], max_tags:
         return valid_tags[:max_tags]
         
     except Exception as e:
+        record_api_error("gemini", status_of(e))
         print(f"タグ予測中にエラーが発生しました: {e}")
         return []
 
 
+async def predict_content_tags_async(content: str, title: str, file_path: str = "tags.txt") -> List[str]:
+    """
+    タグリストをファイルから読み込み、コンテンツに合うタグを予測する
+
+    引数:
+        content: 分析するコンテンツ（マークダウン形式）
+        title: コンテンツのタイトル
+        file_path: タグリストが保存されているファイルパス
+
+    戻り値:
+        List[str]: 予測されたタグのリスト（タグリストが読み込めない場合は空）
+    """
+    available_tags = load_tags_from_file(file_path)
+    if not available_tags:
+        print("タグのリストが読み込めなかったため、タグなしで登録します。")
+        return []
+
+    tags = await predict_tags_async(content, title, available_tags)
+    print(f"予測されたタグ: {tags}")
+    return tags
+
+
+def predict_tags(content: str, title: str, available_tags: List[str], max_tags: int = 5) -> List[str]:
+    """
+    OpenAI APIを使用してコンテンツからタグを予測（同期版。スクリプト・テスト用）
+
+    引数・戻り値は predict_tags_async と同じ
+    """
+    return asyncio.run(predict_tags_async(content, title, available_tags, max_tags))
+
+
 if __name__ == "__main__":
     # テスト用
     
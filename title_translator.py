@@ -1,14 +1,19 @@
 import os
+import asyncio
 from typing import Optional
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from backend_limits import async_backend_slot
+from metrics import STAGE_DURATION, record_api_error, record_llm_usage, status_of
+from tracing import span
 
 # Gemini API設定（OpenAI互換エンドポイント経由で利用）
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
 
-def translate_title(title: str, source_lang: str = "en", target_lang: str = "ja") -> Optional[str]:
+async def translate_title_async(title: str, source_lang: str = "en", target_lang: str = "ja") -> Optional[str]:
     """
-    OpenAI APIを使用してタイトルを翻訳する
+    OpenAI APIを使用してタイトルを翻訳する（非同期版）
     
     引数:
         title: 翻訳するタイトル
@@ -31,19 +36,20 @@ def translate_title(title: str, source_lang: str = "en", target_lang: str = "ja"
         print(f"タイトルは既に日本語の可能性があります: {title}")
         return None
     
-    # クライアントの初期化
-    client = OpenAI(api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL)
-
     try:
-        response = client.chat.completions.create(
-            model="gemini-3.5-flash",
-            messages=[
-                {"role": "system", "content": f"あなたは優秀な{source_lang}から{target_lang}への翻訳者です。与えられたテキストを適切に翻訳してください。翻訳のみを返し、余計な説明は不要です。"},
-                {"role": "user", "content": f"以下のタイトルを翻訳してください：\n{title}"}
-            ],
-            reasoning_effort="none",
-            max_completion_tokens=400
-        )
+        # クライアントの初期化
+        async with AsyncOpenAI(api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL) as client, async_backend_slot("gemini"):
+            with STAGE_DURATION.time(stage="translate"), span("gemini translate"):
+                response = await client.chat.completions.create(
+                    model="gemini-3.5-flash",
+                    messages=[
+                        {"role": "system", "content": f"あなたは優秀な{source_lang}から{target_lang}への翻訳者です。与えられたテキストを適切に翻訳してください。翻訳のみを返し、余計な説明は不要です。"},
+                        {"role": "user", "content": f"以下のタイトルを翻訳してください：\n{title}"}
+                    ],
+                    reasoning_effort="none",
+                    max_completion_tokens=400
+                )
+        record_llm_usage("gemini-3.5-flash", getattr(response, "usage", None))
         
         # レスポンスから翻訳文を抽出
         translated_title = response.choices[0].message.content.strip()
@@ -52,10 +58,20 @@ def translate_title(title: str, source_lang: str = "en", target_lang: str = "ja"
         return translated_title
         
     except Exception as e:
+        record_api_error("gemini", status_of(e))
         print(f"タイトル翻訳中にエラーが発生しました: {e}")
         return None
 
 
+def translate_title(title: str, source_lang: str = "en", target_lang: str = "ja") -> Optional[str]:
+    """
+    OpenAI APIを使用してタイトルを翻訳する（同期版。スクリプト・テスト用）
+
+    引数・戻り値は translate_title_async と同じ
+    """
+    return asyncio.run(translate_title_async(title, source_lang, target_lang))
+
+
 def is_non_japanese_title(title: str) -> bool:
     """
     タイトルが日本語以外の言語（主に英語）かどうかを判定
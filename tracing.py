@@ -0,0 +1,179 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# トレースの出力先（Chrome Trace Event 形式のJSON。Perfetto / chrome://tracing / speedscope で表示できる）
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+TRACE_DIR = os.environ.get("TRACE_DIR", os.path.join(DATA_DIR, "traces"))
+TRACE_EXPORT_ENABLED = os.environ.get("TRACE_EXPORT_ENABLED", "1") not in ("0", "false", "False")
+# 保持するトレースファイルの最大数（古いものから削除）
+TRACE_MAX_FILES = int(os.environ.get("TRACE_MAX_FILES", "500"))
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+
+
+def _lane_key():
+    """
+    スパンを並べるレーン（Trace Event の tid）を決めるキー
+
+    asyncio のタスクごと、スレッド（asyncio.to_thread など）ごとに別レーンにすることで、
+    並行して動くスパン同士が同じレーン上で重ならないようにする。
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return ("task", id(task)), task.get_name()
+    thread = threading.current_thread()
+    return ("thread", thread.ident), thread.name
+
+
+class Trace:
+    """1つのタスクの処理全体を表すトレース（複数のスパンを保持する）"""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        # ファイル名の重複を防ぐID（task_id のないジョブが同じ秒に始まっても別ファイルになる）
+        self.trace_id = uuid.uuid4().hex[:8]
+        self.started_wall = time.time()
+        self._origin = time.perf_counter()
+        self._events: List[Dict] = []
+        self._lanes: Dict[tuple, int] = {}
+        self._lane_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _lane(self) -> int:
+        key, lane_name = _lane_key()
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = len(self._lanes) + 1
+                self._lane_names[lane] = lane_name
+            return lane
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """with ブロックの実行時間をスパンとして記録する"""
+        lane = self._lane()
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            ended = time.perf_counter()
+            args = {key: str(value) for key, value in attrs.items()}
+            if error:
+                args["error"] = error
+            event = {
+                "name": name,
+                "cat": name.split(" ")[0],
+                "ph": "X",
+                "ts": round((started - self._origin) * 1_000_000),
+                "dur": round((ended - started) * 1_000_000),
+                "pid": 1,
+                "tid": lane,
+                "args": args,
+            }
+            with self._lock:
+                self._events.append(event)
+
+    @contextmanager
+    def activate(self):
+        """このトレースを現在のコンテキストのトレースにする（span() の記録先になる）"""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    @property
+    def duration(self) -> float:
+        """最初のスパン開始から最後のスパン終了までの秒数"""
+        with self._lock:
+            if not self._events:
+                return 0.0
+            start = min(e["ts"] for e in self._events)
+            end = max(e["ts"] + e["dur"] for e in self._events)
+        return (end - start) / 1_000_000
+
+    def to_dict(self) -> Dict:
+        """Chrome Trace Event 形式の辞書に変換する"""
+        with self._lock:
+            events = list(self._events)
+            lane_names = dict(self._lane_names)
+        metadata = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": self.name}}]
+        metadata.extend(
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": lane_name}}
+            for lane, lane_name in lane_names.items()
+        )
+        return {
+            "traceEvents": metadata + sorted(events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": dict(
+                {key: str(value) for key, value in self.attrs.items()},
+                name=self.name,
+                trace_id=self.trace_id,
+                started_at=time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_wall)),
+            ),
+        }
+
+    def export(self, directory: str = TRACE_DIR) -> Optional[str]:
+        """
+        トレースをJSONファイルに書き出す
+
+        戻り値:
+            str: 書き出したファイルのパス（無効化されている場合は None）
+        """
+        if not TRACE_EXPORT_ENABLED:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_wall))
+        label = re.sub(r'[^\w.-]+', '_', str(self.attrs.get("task_id", self.name)))[:40]
+        path = os.path.join(directory, f"{stamp}-{label}-{self.trace_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        _prune_trace_files(directory)
+        return path
+
+
+def _prune_trace_files(directory: str) -> None:
+    """古いトレースファイルを TRACE_MAX_FILES 件まで削除する"""
+    try:
+        files = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+        for name in files[:max(0, len(files) - TRACE_MAX_FILES)]:
+            os.remove(os.path.join(directory, name))
+    except OSError as e:
+        print(f"古いトレースファイルの削除に失敗しました: {e}")
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    現在のトレースにスパンを記録する（トレースがない場合は何もしない）
+
+    例:
+        with span("fxtwitter GET", url=api_url):
+            response = await client.get(api_url)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **attrs):
+        yield
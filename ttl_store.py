@@ -0,0 +1,99 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLStore:
+    """
+    有効期限（TTL）と最大件数で古いエントリを自動削除するスレッドセーフなキー・バリューストア
+
+    すべてのエントリは同じTTLを持つため、更新順（OrderedDict の順序）がそのまま期限切れの順になる。
+    期限切れのエントリは書き込み時に先頭からまとめて削除し、最大件数を超えた場合は最も古いものから削除する。
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _purge_locked(self, now: float) -> None:
+        """期限切れのエントリと上限を超えたエントリを削除する（ロック取得済みで呼ぶ）"""
+        while self._data:
+            key, (expires_at, _) = next(iter(self._data.items()))
+            if expires_at > now:
+                break
+            del self._data[key]
+            self.expired += 1
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """値を取得する（存在しないか期限切れの場合は default）"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                    self.expired += 1
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """値を保存する（有効期限は保存時点から ttl_seconds 後）"""
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (now + self.ttl_seconds, value)
+            self._purge_locked(now)
+
+    def update(self, key: Hashable, func: Callable[[Optional[Any]], Any]) -> Any:
+        """
+        現在の値（存在しない場合は None）を func で変換して保存する（読み込みと書き込みをアトミックに行う）
+
+        戻り値:
+            func が返した新しい値
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.pop(key, None)
+            current = entry[1] if entry is not None and entry[0] > now else None
+            value = func(current)
+            self._data[key] = (now + self.ttl_seconds, value)
+            self._purge_locked(now)
+            return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """値を削除して返す"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[1] if entry is not None else default
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """件数とヒット率などの統計情報を返す"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from metrics import TWEET_CACHE_LOOKUPS, register_gauge
+
+# 永続化データの保存先（Render等で永続ディスクがある場合は DATA_DIR で指定）
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+TWEET_CACHE_DB = os.environ.get("TWEET_CACHE_DB", os.path.join(DATA_DIR, "tweet_cache.sqlite3"))
+
+# キャッシュの有効期限（秒）。期限内のポストはfxtwitter APIを呼ばずにキャッシュを使う
+TWEET_CACHE_TTL_SECONDS = float(os.environ.get("TWEET_CACHE_TTL_SECONDS", "86400"))
+# fxtwitter APIが障害で応答しない場合に、期限切れのキャッシュを使ってよい期間（秒）
+TWEET_CACHE_STALE_SECONDS = float(os.environ.get("TWEET_CACHE_STALE_SECONDS", str(7 * 86400)))
+# キャッシュの合計サイズの上限（バイト）。超えた場合は最後に使われたのが古いものから削除する
+TWEET_CACHE_MAX_BYTES = int(os.environ.get("TWEET_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class TweetCache:
+    """
+    fxtwitter APIのtweetオブジェクトをポストIDごとにSQLiteに保存するキャッシュ
+
+    同じ引用ツイートやスレッドが繰り返し投稿されても、有効期限内はAPIを呼ばずに済む。
+    期限切れのエントリもすぐには削除せず、API障害時のフォールバック（allow_stale）に使う。
+    合計サイズが上限を超えた場合は、最後に使われた時刻が古いエントリから削除する。
+    """
+
+    def __init__(
+            self,
+            path: str = TWEET_CACHE_DB,
+            ttl_seconds: float = TWEET_CACHE_TTL_SECONDS,
+            stale_seconds: float = TWEET_CACHE_STALE_SECONDS,
+            max_bytes: int = TWEET_CACHE_MAX_BYTES
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_bytes = max(1, max_bytes)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # イベントループとto_threadのワーカー双方から使うため、接続はロックで保護して共有する
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tweets (
+                post_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tweets_last_access ON tweets (last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM tweets").fetchone()[0]
+
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.stores = 0
+        self.evicted = 0
+
+    def get(self, post_id: str, allow_stale: bool = False) -> Optional[Dict]:
+        """
+        キャッシュからtweetオブジェクトを取得する
+
+        引数:
+            post_id: ポストID
+            allow_stale: 有効期限切れでも TWEET_CACHE_STALE_SECONDS 以内なら返すかどうか（API障害時用）
+
+        戻り値:
+            dict: tweetオブジェクト（キャッシュにない場合は None）
+        """
+        now = time.time()
+        max_age = self.ttl_seconds + (self.stale_seconds if allow_stale else 0)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at FROM tweets WHERE post_id = ?", (post_id,)
+            ).fetchone()
+            if row is None or now - row[1] > max_age:
+                if not allow_stale:
+                    self.misses += 1
+                    TWEET_CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self._conn.execute("UPDATE tweets SET last_access = ? WHERE post_id = ?", (now, post_id))
+            if allow_stale:
+                self.stale_hits += 1
+                TWEET_CACHE_LOOKUPS.inc(result="stale")
+            else:
+                self.hits += 1
+                TWEET_CACHE_LOOKUPS.inc(result="hit")
+        return json.loads(row[0])
+
+    def set(self, post_id: str, tweet: Dict) -> None:
+        """tweetオブジェクトを保存する（合計サイズが上限を超えた場合は古いものを削除する）"""
+        payload = json.dumps(tweet, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM tweets WHERE post_id = ?", (post_id,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tweets (post_id, payload, size, fetched_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (post_id, payload, size, now, now)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self.stores += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        """合計サイズが上限の9割以下になるまで、最後に使われたのが古いエントリから削除する（ロック取得済みで呼ぶ）"""
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT post_id, size FROM tweets ORDER BY last_access").fetchall()
+        removed = []
+        for post_id, size in rows:
+            if self._total_bytes <= target:
+                break
+            removed.append((post_id,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM tweets WHERE post_id = ?", removed)
+        self.evicted += len(removed)
+
+    def stats(self) -> Dict:
+        """件数・サイズとヒット率などの統計情報"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+            total_bytes = self._total_bytes
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evicted": self.evicted,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# プロセス全体で共有するキャッシュ
+tweet_cache = TweetCache()
+
+# /metrics で公開するゲージ
+register_gauge(
+    "tweet_cache_bytes",
+    "Total size of fxtwitter tweet objects stored in the on-disk cache.",
+    lambda: tweet_cache.stats()["bytes"],
+)
+register_gauge(
+    "tweet_cache_entries",
+    "Number of fxtwitter tweet objects stored in the on-disk cache.",
+    lambda: tweet_cache.stats()["entries"],
+)
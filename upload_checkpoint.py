@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from url_index import canonicalize_url
+
+# 永続化データの保存先（Render等で永続ディスクがある場合は DATA_DIR で指定）
+DATA_DIR = os.environ.get("DATA_DIR", "data")
+UPLOAD_CHECKPOINT_DB = os.environ.get("UPLOAD_CHECKPOINT_DB", os.path.join(DATA_DIR, "upload_checkpoints.sqlite3"))
+
+# 再開されないまま残ったチェックポイントを削除するまでの日数
+UPLOAD_CHECKPOINT_TTL_DAYS = float(os.environ.get("UPLOAD_CHECKPOINT_TTL_DAYS", "7"))
+
+
+def content_hash(title: str, tags: Optional[List[str]], content: str) -> str:
+    """
+    登録内容のハッシュ
+
+    バッチの分け方はページのプロパティ（タイトル・タグ）にも依存するため、本文と合わせてハッシュする。
+    """
+    payload = json.dumps([title, tags or [], content], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class UploadCheckpointStore:
+    """
+    Notionへの登録の進捗（作成したページID・送信済みのバッチ数）をSQLiteに記録するストア
+
+    登録の途中でブロックの追加に失敗した場合、同じURLを再度登録すると
+    記録したページに未送信のバッチから追加を再開できる。
+    再開時に取得やLLM呼び出しをやり直さなくて済むよう、タイトル・タグ・本文も保存する。
+    """
+
+    def __init__(self, path: str = UPLOAD_CHECKPOINT_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # イベントループとto_threadのワーカー双方から使うため、接続はロックで保護して共有する
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS uploads (
+                url_key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                title TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                content TEXT NOT NULL,
+                page_id TEXT,
+                page TEXT,
+                next_batch INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return canonicalize_url(url) or url
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        URLのチェックポイントを取得する
+
+        戻り値:
+            dict: url / content_hash / title / tags / content / page_id / page / next_batch（ない場合は None）
+                  next_batch は次に送信するバッチの番号（0 はページ作成、1 以降はブロック追加）
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT url, content_hash, title, tags, content, page_id, page, next_batch
+                FROM uploads WHERE url_key = ?
+                """,
+                (self._key(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        url_, hash_, title, tags, content, page_id, page, next_batch = row
+        return {
+            "url": url_,
+            "content_hash": hash_,
+            "title": title,
+            "tags": json.loads(tags),
+            "content": content,
+            "page_id": page_id,
+            "page": json.loads(page) if page else None,
+            "next_batch": next_batch,
+        }
+
+    def start(self, url: str, title: str, tags: Optional[List[str]], content: str) -> None:
+        """登録の開始を記録する（同じURLの古いチェックポイントは置き換える）"""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO uploads (url_key, url, content_hash, title, tags, content, next_batch, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?)
+                """,
+                (self._key(url), url, content_hash(title, tags, content), title,
+                 json.dumps(tags or [], ensure_ascii=False), content, time.time())
+            )
+
+    def page_created(self, url: str, page: Dict) -> None:
+        """ページ作成（バッチ0）の完了を記録する"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE uploads SET page_id = ?, page = ?, next_batch = 1, updated_at = ? WHERE url_key = ?",
+                (page["id"], json.dumps(page, ensure_ascii=False), time.time(), self._key(url))
+            )
+
+    def batch_done(self, url: str, batch_number: int) -> None:
+        """ブロック追加のバッチ batch_number の完了を記録する"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE uploads SET next_batch = ?, updated_at = ? WHERE url_key = ?",
+                (batch_number + 1, time.time(), self._key(url))
+            )
+
+    def delete(self, url: str) -> None:
+        """登録が完了した（または再開できなくなった）チェックポイントを削除する"""
+        with self._lock:
+            self._conn.execute("DELETE FROM uploads WHERE url_key = ?", (self._key(url),))
+
+    def purge(self, max_age_seconds: float = UPLOAD_CHECKPOINT_TTL_DAYS * 86400) -> int:
+        """
+        長期間再開されていないチェックポイントを削除する（起動時に呼び出す）
+
+        戻り値:
+            int: 削除した件数
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM uploads WHERE updated_at < ?", (time.time() - max_age_seconds,)
+            )
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# プロセス全体で共有するチェックポイントストア
+upload_checkpoints = UploadCheckpointStore()
@@ -0,0 +1,112 @@
+import re
+import threading
+from typing import Iterable, Optional, Set
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# 正規化時に取り除くトラッキング用クエリパラメータ
+_TRACKING_PARAMS = {
+    "fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src", "ref_url", "igshid", "si",
+}
+_TRACKING_PREFIXES = ("utm_",)
+
+# 正規化時に同一視するホスト名
+_HOST_ALIASES = {
+    "twitter.com": "x.com",
+    "mobile.twitter.com": "x.com",
+    "mobile.x.com": "x.com",
+    "m.youtube.com": "youtube.com",
+}
+
+_X_STATUS_PATH = re.compile(r'^/\w+/status/(\d+)')
+
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """
+    URLを重複判定用の正規形に変換する
+
+    - スキーム・ホスト名を小文字化し、www. を除去
+    - twitter.com などの別名ホストを統一
+    - X/Twitterのポストはユーザー名に依存しない形（x.com/i/status/<id>）に統一
+    - フラグメント、トラッキング用パラメータ、末尾のスラッシュを除去
+    - 残りのクエリパラメータはキー順に並べ替え
+
+    戻り値:
+        str: 正規化したURL（URLとして解釈できない場合は None）
+    """
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    host = _HOST_ALIASES.get(host, host)
+
+    path = parts.path or "/"
+    if host == "x.com":
+        m = _X_STATUS_PATH.match(path)
+        if m:
+            return f"https://x.com/i/status/{m.group(1)}"
+
+    path = path.rstrip("/") or "/"
+    query_items = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in _TRACKING_PARAMS and not key.lower().startswith(_TRACKING_PREFIXES)
+    ]
+    query = urlencode(sorted(query_items))
+    return urlunsplit(("https", host, path, query, ""))
+
+
+class RegisteredUrlIndex:
+    """
+    Notionデータベースに登録済みのURL（正規形）を保持するインデックス
+
+    起動時にデータベースの URL プロパティから一度だけ読み込み（seed）、
+    以降はページ登録のたびに add で追加する。
+    """
+
+    def __init__(self):
+        self._urls: Set[str] = set()
+        self._lock = threading.Lock()
+        self.seeded = False
+
+    def seed(self, urls: Iterable[str]) -> int:
+        """
+        登録済みURLをまとめて読み込む
+
+        戻り値:
+            int: 読み込み後のインデックスの件数
+        """
+        canonical = {c for c in (canonicalize_url(url) for url in urls) if c}
+        with self._lock:
+            self._urls.update(canonical)
+            self.seeded = True
+            return len(self._urls)
+
+    def add(self, url: str) -> None:
+        """登録したURLをインデックスに追加する"""
+        canonical = canonicalize_url(url)
+        if canonical:
+            with self._lock:
+                self._urls.add(canonical)
+
+    def contains(self, url: str) -> bool:
+        """URLが登録済みかどうかを判定する"""
+        canonical = canonicalize_url(url)
+        if not canonical:
+            return False
+        with self._lock:
+            return canonical in self._urls
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._urls)
+
+
+# プロセス全体で共有するインデックス
+registered_url_index = RegisteredUrlIndex()